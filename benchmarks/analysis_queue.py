@@ -0,0 +1,117 @@
+"""Очереди на категоризацию: celery (RabbitMQ) против Redis Streams.
+
+Запуск: python -m benchmarks.analysis_queue [celery|celery-buffered|redis ...]
+
+Нужны поднятые база, RabbitMQ и Redis, celery-воркер и python -m transaction_service.tasks.stream_worker.
+Публикация - время вызова analyze() внутри event loop, как в обработчике API.
+Сквозная задержка - от публикации до смены processing_status у вставленной транзакции.
+"""
+import asyncio
+import os
+import statistics
+import sys
+import time
+import uuid
+from datetime import datetime
+from decimal import Decimal
+
+from redis.asyncio import Redis
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+
+from transaction_service.config import load_config
+from transaction_service.models import Transaction
+from transaction_service.repositories.transaction_repository import TransactionRepository
+from transaction_service.tasks.producer import AIRemoteTransactionAnalyzer
+from transaction_service.tasks.publisher import BufferedTransactionAnalyzer
+from transaction_service.tasks.stream_analyzer import RedisStreamTransactionAnalyzer
+
+PUBLISH_ROUNDS = 1000
+E2E_ROWS = 200
+POLL_INTERVAL = 0.01
+
+
+def percentiles(samples: list[float]) -> str:
+    quantiles = statistics.quantiles(samples, n=100)
+    return f'p50 {quantiles[49] * 1000:8.3f} ms  p99 {quantiles[98] * 1000:8.3f} ms'
+
+
+def build_transaction(user_id: uuid.UUID, i: int) -> dict:
+    return {
+        'id': uuid.uuid4(),
+        'entry_date': datetime(2025, 1, 1 + i % 28),
+        'receipt_date': datetime(2025, 1, 1 + i % 28),
+        'user_id': user_id,
+        'withdraw': Decimal(100 + i),
+        'deposit': Decimal(0),
+        'processing_status': 'in_progress',
+        'category': None,
+        'expediency': 0,
+        'balance': Decimal(100_000),
+        'created_at': datetime.now(),
+    }
+
+
+async def bench_publish(analyzer) -> None:
+    samples = []
+    for _ in range(PUBLISH_ROUNDS):
+        start = time.perf_counter()
+        await analyzer.analyze(uuid.uuid4())
+        samples.append(time.perf_counter() - start)
+    print(f'  publish:    {percentiles(samples)}')
+
+
+async def bench_end_to_end(analyzer, engine) -> None:
+    user_id = uuid.uuid4()
+    transactions = [build_transaction(user_id, i) for i in range(E2E_ROWS)]
+    async with AsyncSession(engine) as session:
+        await TransactionRepository(session).create_account_stmt(transactions)
+
+    published = {}
+    for ts in transactions:
+        published[ts['id']] = time.perf_counter()
+        await analyzer.analyze(ts['id'])
+
+    samples = []
+    while published:
+        async with AsyncSession(engine) as session:
+            res = await session.execute(
+                select(Transaction.id)
+                .where(Transaction.id.in_(published), Transaction.processing_status != 'in_progress')
+            )
+            now = time.perf_counter()
+            for transaction_id in res.scalars():
+                samples.append(now - published.pop(transaction_id))
+        await asyncio.sleep(POLL_INTERVAL)
+    print(f'  end-to-end: {percentiles(samples)}')
+
+
+async def main(backends: list[str]) -> None:
+    cfg = load_config(os.getenv('TRANSACTION_SERVICE_CONFIG_PATH', './configs/app.toml'))
+    engine = create_async_engine(cfg.db.uri)
+    redis = Redis.from_url(cfg.redis.uri)
+    celery_analyzer = AIRemoteTransactionAnalyzer()
+    buffered_analyzer = BufferedTransactionAnalyzer(
+        max_pending=cfg.publisher.max_pending,
+        max_batch=cfg.publisher.max_batch,
+        flush_interval=cfg.publisher.flush_interval,
+    )
+    buffered_analyzer.start()
+    analyzers = {
+        'celery': celery_analyzer,
+        'celery-buffered': buffered_analyzer,
+        'redis': RedisStreamTransactionAnalyzer(redis, cfg.analysis, fit_delegate=celery_analyzer),
+    }
+
+    for backend in backends or analyzers:
+        print(backend)
+        await bench_publish(analyzers[backend])
+        await bench_end_to_end(analyzers[backend], engine)
+
+    await buffered_analyzer.close()
+    await redis.aclose()
+    await engine.dispose()
+
+
+if __name__ == '__main__':
+    asyncio.run(main(sys.argv[1:]))
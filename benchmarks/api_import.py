@@ -0,0 +1,44 @@
+"""Стоимость импорта процесса API: время импорта transaction_service.main и RSS после него.
+
+Запуск: python -m benchmarks.api_import [rounds]
+
+Каждый замер - отдельный интерпретатор, запущенный из корня репозитория (main монтирует static/).
+Дополнительно печатается, какие тяжёлые модули оказались загружены.
+"""
+import json
+import statistics
+import subprocess
+import sys
+
+HEAVY_MODULES = ('pandas', 'numpy', 'catboost', 'celery', 'transaction_service.services.ai_service')
+
+PROBE = f'''
+import json, resource, sys, time
+start = time.perf_counter()
+import transaction_service.main
+elapsed = time.perf_counter() - start
+print(json.dumps({{
+    'seconds': elapsed,
+    'max_rss_mb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    'heavy': [m for m in {HEAVY_MODULES!r} if m in sys.modules],
+}}))
+'''
+
+
+def probe() -> dict:
+    output = subprocess.run([sys.executable, '-c', PROBE], capture_output=True, text=True, check=True)
+    return json.loads(output.stdout.splitlines()[-1])
+
+
+def main(rounds: int) -> None:
+    samples = [probe() for _ in range(rounds)]
+    seconds = [sample['seconds'] for sample in samples]
+    rss = [sample['max_rss_mb'] for sample in samples]
+    print(f'import transaction_service.main: median {statistics.median(seconds) * 1000:8.1f} ms  '
+          f'min {min(seconds) * 1000:8.1f} ms')
+    print(f'max RSS after import:            median {statistics.median(rss):8.1f} MB')
+    print(f'heavy modules loaded:            {", ".join(samples[-1]["heavy"]) or "-"}')
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 5)
@@ -0,0 +1,69 @@
+"""Признаки для модели: data_normalization по строкам d/m/Y против build_features.
+
+Запуск: python -m benchmarks.feature_engineering
+
+Прежний путь включает strftime на каждую строку, как это делали задачи ai_tasks.
+Перед замером кадры сравниваются через assert_frame_equal без допусков.
+"""
+import random
+import time
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+import pandas as pd
+
+from transaction_service.services.ai_service import build_features, data_normalization
+
+SIZES = (1, 256, 10_000)
+ROUNDS = 20
+
+
+def generate(size: int) -> dict:
+    rnd = random.Random(size)
+    start = datetime(2024, 1, 1)
+    entry_dates = [
+        start + timedelta(days=rnd.randrange(730), minutes=rnd.randrange(1440))
+        for _ in range(size)
+    ]
+    amounts = [Decimal(rnd.randrange(1, 10 ** 6)) / 100 for _ in range(size)]
+    flags = [rnd.random() < 0.2 for _ in range(size)]
+    return {
+        'entry_dates': entry_dates,
+        'receipt_dates': [date + timedelta(days=rnd.randrange(3)) for date in entry_dates],
+        'balances': [Decimal(rnd.randrange(10 ** 7)) / 100 for _ in range(size)],
+        'withdrawals': [Decimal(0) if deposit else amount for amount, deposit in zip(amounts, flags)],
+        'deposits': [amount if deposit else Decimal(0) for amount, deposit in zip(amounts, flags)],
+    }
+
+
+def legacy_features(rows: dict) -> pd.DataFrame:
+    return data_normalization(pd.DataFrame(data={
+        'Date': [date.strftime('%d/%m/%Y') for date in rows['entry_dates']],
+        'Date.1': [date.strftime('%d/%m/%Y') for date in rows['receipt_dates']],
+        'Balance': rows['balances'],
+        'Withdrawal': rows['withdrawals'],
+        'Deposit': rows['deposits'],
+    }))
+
+
+def timeit(func, rows: dict) -> float:
+    start = time.perf_counter()
+    for _ in range(ROUNDS):
+        func(rows)
+    return (time.perf_counter() - start) / ROUNDS
+
+
+def main() -> None:
+    print(f'{"rows":>7} {"legacy, ms":>11} {"vectorized, ms":>15} {"speedup":>8}')
+    for size in SIZES:
+        rows = generate(size)
+        pd.testing.assert_frame_equal(legacy_features(rows), build_features(**rows), check_exact=True)
+
+        legacy = timeit(legacy_features, rows)
+        vectorized = timeit(lambda r: build_features(**r), rows)
+        speedup = legacy / vectorized
+        print(f'{size:>7} {legacy * 1000:>11.2f} {vectorized * 1000:>15.2f} {speedup:>7.1f}x')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,114 @@
+"""Чтение и сериализация страницы GET /transactions/: ORM + pydantic против кортежей + pydantic-core.
+
+Запуск: python -m benchmarks.list_serialization [rows_per_page ...]
+
+База - SQLite в памяти: сравнивается работа процесса API над строками, а не сам запрос.
+orm - прежний путь: ORM-объекты, model_validate на строку и сериализация FastAPI по response_model.
+core - кортежи колонок TRANSACTION_RESPONSE_FIELDS и encode_transactions_page.
+Перед замером проверяется, что оба пути отдают одинаковый JSON.
+"""
+import asyncio
+import json
+import sys
+import time
+import uuid
+import warnings
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+from fastapi.responses import JSONResponse
+from fastapi.routing import APIRoute, serialize_response
+from sqlalchemy import create_engine, exc, insert, select
+from sqlalchemy.orm import Session
+
+from transaction_service.models import Transaction
+from transaction_service.schemas.transaction import (
+    TRANSACTION_RESPONSE_FIELDS,
+    ManyTransactionsResponse,
+    TransactionResponse,
+)
+from transaction_service.services.transaction_service import encode_transactions_page
+
+ROUNDS = 50
+
+# SQLite хранит DECIMAL как float - для замера это неважно
+warnings.filterwarnings('ignore', category=exc.SAWarning)
+
+
+def fill(engine, rows: int) -> uuid.UUID:
+    user_id = uuid.uuid4()
+    start = datetime(2025, 1, 1)
+    with engine.begin() as connection:
+        Transaction.__table__.create(connection, checkfirst=True)
+        connection.execute(insert(Transaction.__table__), [
+            {
+                'id': uuid.uuid4(),
+                'user_id': user_id,
+                'entry_date': start + timedelta(minutes=i),
+                'receipt_date': start + timedelta(minutes=i),
+                'withdraw': Decimal('123.45'),
+                'deposit': Decimal('0'),
+                'processing_status': 'completed',
+                'category': 'Супермаркеты',
+                'expediency': 1,
+                'balance': Decimal('10000.00'),
+                'created_at': start,
+            }
+            for i in range(rows)
+        ])
+    return user_id
+
+
+async def orm_page(engine, user_id: uuid.UUID, response_field) -> bytes:
+    with Session(engine) as session:
+        transactions = session.scalars(
+            select(Transaction)
+            .where(Transaction.user_id == user_id)
+            .order_by(Transaction.receipt_date.desc())
+        ).all()
+        page = ManyTransactionsResponse(
+            total=len(transactions),
+            results=[TransactionResponse.model_validate(ts) for ts in transactions],
+        )
+    content = await serialize_response(field=response_field, response_content=page)
+    return JSONResponse(content).body
+
+
+async def core_page(engine, user_id: uuid.UUID) -> bytes:
+    with engine.connect() as connection:
+        rows = connection.execute(
+            select(*(Transaction.__table__.c[name] for name in TRANSACTION_RESPONSE_FIELDS))
+            .where(Transaction.user_id == user_id)
+            .order_by(Transaction.receipt_date.desc())
+        ).all()
+    return encode_transactions_page(rows, len(rows), None)
+
+
+async def measure(page, *args) -> float:
+    start = time.perf_counter()
+    for _ in range(ROUNDS):
+        await page(*args)
+    return (time.perf_counter() - start) / ROUNDS
+
+
+async def main(page_sizes: list[int]) -> None:
+    route = APIRoute('/transactions/', lambda: None, response_model=ManyTransactionsResponse)
+    for rows in page_sizes or (10, 100, 1000):
+        engine = create_engine('sqlite://')
+        user_id = fill(engine, rows)
+
+        orm_body = await orm_page(engine, user_id, route.response_field)
+        core_body = await core_page(engine, user_id)
+        assert json.loads(orm_body) == json.loads(core_body), 'responses differ'
+
+        orm = await measure(orm_page, engine, user_id, route.response_field)
+        core = await measure(core_page, engine, user_id)
+        print(
+            f'{rows:5} rows  orm {orm / rows * 1e6:7.1f} us/row  '
+            f'core {core / rows * 1e6:7.1f} us/row  x{orm / core:4.1f}'
+        )
+        engine.dispose()
+
+
+if __name__ == '__main__':
+    asyncio.run(main([int(arg) for arg in sys.argv[1:]]))
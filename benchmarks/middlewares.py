@@ -0,0 +1,99 @@
+"""Накладные расходы middleware: BaseHTTPMiddleware (как было) против чистого ASGI.
+
+Запуск: python -m benchmarks.middlewares
+
+Приложение с одной ручкой гоняется через httpx.ASGITransport без сети. Лимитер всегда
+пропускает запрос и в Redis не ходит - меряется только сама обвязка middleware.
+Печатаются p50/p99 задержки запроса для стека без middleware, старого и нового.
+"""
+import asyncio
+import os
+import statistics
+import time
+
+import httpx
+from dishka import Provider, Scope, make_async_container
+from fastapi import FastAPI
+from starlette.middleware.base import BaseHTTPMiddleware
+
+from transaction_service.config import Config, load_config
+from transaction_service.controllers.middlewares.metrics_middleware import RequestCountMiddleware
+from transaction_service.controllers.middlewares.rate_limiting_middleware import RateLimitMiddleware
+from transaction_service.utils.metrics import REQUESTS_TOTAL
+from transaction_service.utils.rate_limiter import SlidingWindowRateLimiter
+
+REQUESTS = 5000
+WARM_UP = 200
+
+
+class PassThroughLimiter:
+    async def hit(self, client: str, method: str, path: str):
+        return None
+
+
+class LegacyRequestCountMiddleware(BaseHTTPMiddleware):
+    async def dispatch(self, request, call_next):
+        REQUESTS_TOTAL.inc()
+        return await call_next(request)
+
+
+class LegacyRateLimitMiddleware(BaseHTTPMiddleware):
+    # Прежняя схема: зависимость из контейнера на каждый запрос
+    def __init__(self, app, ioc_container):
+        super().__init__(app)
+        self._ioc_container = ioc_container
+
+    async def dispatch(self, request, call_next):
+        rate_limiter = await self._ioc_container.get(SlidingWindowRateLimiter)
+        await rate_limiter.hit(request.client.host, request.method, request.url.path)
+        return await call_next(request)
+
+
+def build_container():
+    cfg = load_config(os.getenv('TRANSACTION_SERVICE_CONFIG_PATH', './configs/app.toml'))
+    cfg.metrics.per_route = True
+    provider = Provider()
+    provider.provide(lambda: cfg, scope=Scope.APP, provides=Config)
+    provider.provide(PassThroughLimiter, scope=Scope.APP, provides=SlidingWindowRateLimiter)
+    return make_async_container(provider)
+
+
+def build_app(stack: str) -> FastAPI:
+    app = FastAPI()
+
+    @app.get('/transactions/{transaction_id}')
+    async def get_transaction(transaction_id: str):
+        return {'id': transaction_id}
+
+    container = build_container()
+    if stack == 'legacy':
+        app.add_middleware(LegacyRequestCountMiddleware)
+        app.add_middleware(LegacyRateLimitMiddleware, ioc_container=container)
+    elif stack == 'asgi':
+        app.add_middleware(RequestCountMiddleware, ioc_container=container)
+        app.add_middleware(RateLimitMiddleware, ioc_container=container)
+    return app
+
+
+async def bench(stack: str) -> list[float]:
+    transport = httpx.ASGITransport(app=build_app(stack))
+    async with httpx.AsyncClient(transport=transport, base_url='http://bench') as client:
+        for i in range(WARM_UP):
+            await client.get(f'/transactions/{i}')
+        samples = []
+        for i in range(REQUESTS):
+            start = time.perf_counter()
+            await client.get(f'/transactions/{i}')
+            samples.append(time.perf_counter() - start)
+    return samples
+
+
+async def main() -> None:
+    print(f'{"stack":>8} {"p50, us":>9} {"p99, us":>9}')
+    for stack in ('none', 'legacy', 'asgi'):
+        quantiles = statistics.quantiles(await bench(stack), n=100)
+        print(f'{stack:>8} {quantiles[49] * 1e6:>9.1f} {quantiles[98] * 1e6:>9.1f}')
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
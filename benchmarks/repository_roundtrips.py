@@ -0,0 +1,129 @@
+"""Запись результата анализа: обращения к базе и задержка на одну транзакцию.
+
+Запуск: python -m benchmarks.repository_roundtrips [orm|returning|set-based ...]
+
+Нужна поднятая база с применёнными миграциями.
+orm - прежний update_analysis: SELECT через get, изменение объекта, COMMIT, refresh.
+returning - update_analysis на UPDATE ... RETURNING, set-based - update_analysis_many на всю пачку.
+Обращения считаются по событиям движка: выполненные запросы плюс BEGIN и COMMIT.
+"""
+import asyncio
+import os
+import statistics
+import sys
+import time
+import uuid
+from datetime import datetime
+from decimal import Decimal
+
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+
+from transaction_service.config import load_config
+from transaction_service.repositories.transaction_repository import TransactionRepository
+
+ROWS = 500
+CATEGORIES = ('Супермаркеты', 'Рестораны', 'Транспорт', 'Связь')
+
+
+class RoundTripCounter:
+    def __init__(self, engine):
+        self.count = 0
+        for name in ('before_cursor_execute', 'begin', 'commit'):
+            event.listen(engine.sync_engine, name, self._hit)
+
+    def _hit(self, *args, **kwargs):
+        self.count += 1
+
+
+def build_transaction(user_id: uuid.UUID, i: int) -> dict:
+    return {
+        'id': uuid.uuid4(),
+        'entry_date': datetime(2025, 1, 1 + i % 28),
+        'receipt_date': datetime(2025, 1, 1 + i % 28),
+        'user_id': user_id,
+        'withdraw': Decimal(100 + i),
+        'deposit': Decimal(0),
+        'processing_status': 'in_progress',
+        'category': None,
+        'expediency': 0,
+        'balance': Decimal(100_000),
+        'created_at': datetime.now(),
+    }
+
+
+async def legacy_update_analysis(repository: TransactionRepository, result: dict):
+    transaction = await repository.get(result['id'])
+    await repository.aggregates.track_recategorized([(
+        transaction.user_id,
+        transaction.category,
+        result['category'],
+        transaction.entry_date,
+        transaction.withdraw,
+    )])
+    transaction.category = result['category']
+    transaction.expediency = result['expediency']
+    transaction.processing_status = result['processing_status']
+    await repository.outbox.complete([result['id']])
+    await repository.session.commit()
+    await repository.session.refresh(transaction)
+
+
+async def returning_update_analysis(repository: TransactionRepository, result: dict):
+    await repository.update_analysis(
+        result['id'], result['category'], result['expediency'], result['processing_status'],
+    )
+
+
+async def run(mode: str, engine, counter: RoundTripCounter) -> None:
+    user_id = uuid.uuid4()
+    transactions = [build_transaction(user_id, i) for i in range(ROWS)]
+    async with AsyncSession(engine, expire_on_commit=False) as session:
+        await TransactionRepository(session).create_account_stmt(transactions)
+
+    results = [
+        {
+            'id': ts['id'],
+            'category': CATEGORIES[i % len(CATEGORIES)],
+            'expediency': 1,
+            'processing_status': 'completed',
+        }
+        for i, ts in enumerate(transactions)
+    ]
+
+    samples = []
+    counter.count = 0
+    start = time.perf_counter()
+    async with AsyncSession(engine, expire_on_commit=False) as session:
+        repository = TransactionRepository(session)
+        if mode == 'set-based':
+            await repository.update_analysis_many(results)
+        else:
+            update_analysis = legacy_update_analysis if mode == 'orm' else returning_update_analysis
+            for result in results:
+                row_start = time.perf_counter()
+                await update_analysis(repository, result)
+                samples.append(time.perf_counter() - row_start)
+    elapsed = time.perf_counter() - start
+
+    line = (
+        f'{mode:10} round-trips/ts {counter.count / ROWS:6.2f}  '
+        f'mean {elapsed / ROWS * 1000:8.3f} ms/ts'
+    )
+    if samples:
+        quantiles = statistics.quantiles(samples, n=100)
+        line += f'  p50 {quantiles[49] * 1000:8.3f} ms  p99 {quantiles[98] * 1000:8.3f} ms'
+    print(line)
+
+
+async def main(modes: list[str]) -> None:
+    cfg = load_config(os.getenv('TRANSACTION_SERVICE_CONFIG_PATH', './configs/app.toml'))
+    engine = create_async_engine(cfg.db.uri)
+    counter = RoundTripCounter(engine)
+    for mode in modes or ('orm', 'returning', 'set-based'):
+        await run(mode, engine, counter)
+    await engine.dispose()
+
+
+if __name__ == '__main__':
+    asyncio.run(main(sys.argv[1:]))
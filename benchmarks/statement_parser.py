@@ -0,0 +1,85 @@
+"""Разбор pdf-выписки: старый последовательный разбор против пула процессов.
+
+Запуск: python -m benchmarks.statement_parser path/to/statement.pdf
+
+Из страниц переданной выписки собираются документы на 1, 50 и 500 страниц.
+Для пула печатается время до первой пачки строк (когда уже можно писать в базу) и общее время.
+"""
+import asyncio
+import multiprocessing
+import re
+import sys
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from io import BytesIO
+
+import PyPDF2
+
+from transaction_service.services.statement_parsers import AccountStatementParser
+
+PAGES = (1, 50, 500)
+
+
+def build_statement(sample: bytes, pages_count: int) -> bytes:
+    reader = PyPDF2.PdfReader(BytesIO(sample))
+    writer = PyPDF2.PdfWriter()
+    for i in range(pages_count):
+        writer.add_page(reader.pages[i % len(reader.pages)])
+    with BytesIO() as out:
+        writer.write(out)
+        return out.getvalue()
+
+
+def legacy_parse(pdf_content: bytes) -> int:
+    # Повторяет прежний TransactionService._parse_account_stmt без построения словарей
+    read_pdf = PyPDF2.PdfReader(BytesIO(pdf_content))
+    full_text = ""
+    for page in read_pdf.pages:
+        full_text += page.extract_text()
+    transactions_pattern = (
+        r'(\d{2}\.\d{2}\.\d{2})\s*(?:\d{2}:\d{2})?\s+(\d{2}\.\d{2}\.\d{2})\s+'
+        r'([+-]?\s*\d+(?:\s*\d{3})*(?:\.\d+)?\s*i)'
+    )
+    return len(re.findall(transactions_pattern, full_text, re.MULTILINE))
+
+
+async def pipeline_parse(parser: AccountStatementParser, pdf_content: bytes) -> tuple[float, int]:
+    start = time.perf_counter()
+    first_chunk = None
+    rows = 0
+    async for transactions in parser.iter_transactions(pdf_content, user_id=uuid.uuid4(), bank='tbank'):
+        if first_chunk is None:
+            first_chunk = time.perf_counter() - start
+        rows += len(transactions)
+    return first_chunk or 0.0, rows
+
+
+async def main(sample_path: str) -> None:
+    with open(sample_path, 'rb') as f:
+        sample = f.read()
+
+    executor = ProcessPoolExecutor(mp_context=multiprocessing.get_context('spawn'))
+    parser = AccountStatementParser(executor)
+    # Прогрев: поднимаем процессы пула до замеров
+    await pipeline_parse(parser, build_statement(sample, 1))
+
+    print(f'{"pages":>6} {"rows":>7} {"legacy, s":>10} {"pool first, s":>14} {"pool total, s":>14}')
+    for pages_count in PAGES:
+        pdf_content = build_statement(sample, pages_count)
+
+        start = time.perf_counter()
+        rows = legacy_parse(pdf_content)
+        legacy = time.perf_counter() - start
+
+        start = time.perf_counter()
+        first_chunk, _ = await pipeline_parse(parser, pdf_content)
+        total = time.perf_counter() - start
+
+        print(f'{pages_count:>6} {rows:>7} {legacy:>10.3f} {first_chunk:>14.3f} {total:>14.3f}')
+
+    executor.shutdown()
+
+
+if __name__ == '__main__':
+    asyncio.run(main(sys.argv[1]))
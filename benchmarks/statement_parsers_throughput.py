@@ -0,0 +1,58 @@
+"""Пропускная способность парсеров выписок по банкам.
+
+Запуск: python -m benchmarks.statement_parsers_throughput tbank=path/to/tbank.pdf [other=path ...]
+
+Для каждого банка печатается время ленивой загрузки парсера, скорость разбора уже извлечённого
+текста (только регулярки) и полного iter_transactions по pdf. Новый парсер не должен менять
+цифры tbank: парсеры загружаются независимо и не делят паттерны.
+"""
+import sys
+import time
+import uuid
+from io import BytesIO
+
+import PyPDF2
+
+from transaction_service.services.statement_parsers import get_parser
+
+ROUNDS = 20
+
+
+def bench_bank(bank: str, path: str) -> None:
+    with open(path, 'rb') as f:
+        pdf_content = f.read()
+    texts = [page.extract_text() for page in PyPDF2.PdfReader(BytesIO(pdf_content)).pages]
+
+    start = time.perf_counter()
+    parser = get_parser(bank)
+    load_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    rows = 0
+    for _ in range(ROUNDS):
+        for text in texts:
+            rows += len(parser.parse_page_text(text).entries)
+    regex_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for _ in range(ROUNDS):
+        for _ in parser.iter_transactions(pdf_content, user_id=uuid.uuid4()):
+            pass
+    full_time = time.perf_counter() - start
+
+    pages = len(texts) * ROUNDS
+    print(
+        f'{bank:>10} load {load_time * 1000:8.2f} ms | '
+        f'text: {pages / regex_time:10.1f} pages/s {rows / regex_time:10.1f} rows/s | '
+        f'pdf: {pages / full_time:8.1f} pages/s'
+    )
+
+
+def main(args: list[str]) -> None:
+    for arg in args:
+        bank, path = arg.split('=', 1)
+        bench_bank(bank, path)
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
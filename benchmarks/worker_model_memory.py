@@ -0,0 +1,64 @@
+"""Модель в дочерних процессах prefork: загрузка до fork против загрузки в каждом процессе.
+
+Запуск: python -m benchmarks.worker_model_memory [children]
+
+Повторяет то, что делает celery: главный процесс импортирует tasks.ai_tasks, при preload
+загружает модель (как preload_model на worker_init), затем форкает дочерние процессы.
+Каждый дочерний процесс делает первое предсказание и сообщает время до него от своего старта
+и память: pss - с долей разделяемых страниц, private - только свои страницы.
+"""
+import gc
+import multiprocessing
+import statistics
+import sys
+import time
+
+from transaction_service.services.ai_service import build_features, predict_many
+from transaction_service.tasks.ai_tasks import build_model_server
+from transaction_service.utils.process_memory import memory_usage
+from benchmarks.feature_engineering import generate
+
+BATCH_ROWS = 256
+
+
+def child(preloaded, queue) -> None:
+    started_at = time.monotonic()
+    model_server = preloaded or build_model_server(reload_interval=None)
+    _, model = model_server.get()
+    predict_many(model, build_features(**generate(BATCH_ROWS)))
+    queue.put((time.monotonic() - started_at, memory_usage()))
+
+
+def run(preload: bool, children: int) -> None:
+    preloaded = None
+    if preload:
+        preloaded = build_model_server(reload_interval=None)
+        gc.freeze()
+
+    context = multiprocessing.get_context('fork')
+    queue = context.Queue()
+    processes = [context.Process(target=child, args=(preloaded, queue)) for _ in range(children)]
+    for process in processes:
+        process.start()
+    results = [queue.get() for _ in processes]
+    for process in processes:
+        process.join()
+    gc.unfreeze()
+
+    first_prediction = [seconds for seconds, _ in results]
+    usage = [memory for _, memory in results]
+    print(
+        f'{"preload" if preload else "per-child":9}  '
+        f'first prediction median {statistics.median(first_prediction) * 1000:8.1f} ms  '
+        f'pss {statistics.mean(m.get("pss", m["rss"]) for m in usage) / 1024:7.1f} MB  '
+        f'private {statistics.mean(m.get("private", m["rss"]) for m in usage) / 1024:7.1f} MB'
+    )
+
+
+def main(children: int) -> None:
+    for preload in (False, True):
+        run(preload, children)
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 4)
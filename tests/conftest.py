@@ -0,0 +1,99 @@
+import uuid
+from datetime import datetime
+from types import SimpleNamespace
+
+import pytest
+from dishka import Provider, Scope, make_async_container, provide
+from dishka.integrations.fastapi import setup_dishka
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from transaction_service.config import Config, load_config
+from transaction_service.controllers.transactions import router
+from transaction_service.services.transaction_service import TransactionService
+
+
+class FakeRepository:
+    # create_many как у TransactionRepository: строки с умолчаниями колонок в порядке входа
+    def __init__(self):
+        self.created = []
+        # Строки для get_all - кортежи колонок в порядке выдачи
+        self.rows = []
+
+    async def create_many(self, transactions):
+        rows = [
+            SimpleNamespace(
+                id=uuid.uuid4(),
+                processing_status='in_progress',
+                category=None,
+                expediency=None,
+                created_at=datetime(2025, 1, 1, 12, 0),
+                **ts.model_dump(),
+            )
+            for ts in transactions
+        ]
+        self.created.extend(rows)
+        return rows
+
+    async def get_all(self, user_id, columns, skip=0, limit=10, include_total=True, **filters):
+        return self.rows[skip:skip + limit], len(self.rows) if include_total else None
+
+
+class FakeAnalyzer:
+    def __init__(self):
+        self.analyzed = []
+
+    async def analyze_many(self, transaction_ids):
+        self.analyzed.append(list(transaction_ids))
+
+
+def transaction_payload(**overrides) -> dict:
+    payload = {
+        'user_id': str(uuid.uuid4()),
+        'entry_date': '2025-01-01T10:00:00',
+        'receipt_date': '2025-01-01T10:00:00',
+        'withdraw': '123.45',
+        'balance': '1000.00',
+        'deposit': '0',
+    }
+    payload.update(overrides)
+    return payload
+
+
+@pytest.fixture
+def repository() -> FakeRepository:
+    return FakeRepository()
+
+
+@pytest.fixture
+def analyzer() -> FakeAnalyzer:
+    return FakeAnalyzer()
+
+
+@pytest.fixture
+def service(repository, analyzer) -> TransactionService:
+    return TransactionService(
+        repository=repository,
+        financial_category_analyzer=analyzer,
+        statement_parser=None,
+        model_retrainer=None,
+        cache=None,
+    )
+
+
+@pytest.fixture
+def client(service):
+    class TestProvider(Provider):
+        @provide(scope=Scope.APP)
+        def get_config(self) -> Config:
+            return load_config('./configs/app.toml')
+
+        @provide(scope=Scope.REQUEST)
+        def get_service(self) -> TransactionService:
+            return service
+
+    app = FastAPI()
+    app.include_router(router, prefix='/api/v1')
+    setup_dishka(make_async_container(TestProvider()), app)
+    with TestClient(app) as test_client:
+        yield test_client
@@ -0,0 +1,41 @@
+import asyncio
+import uuid
+from types import SimpleNamespace
+
+import pytest
+
+from transaction_service.tasks import ai_tasks
+
+
+@pytest.fixture
+def chunks(monkeypatch):
+    # Пачки по 2 транзакции; анализ второй пачки падает
+    analyzed, failed = [], []
+
+    async def analyze_transactions(container, transaction_ids):
+        if len(analyzed) == 1:
+            analyzed.append(None)
+            raise RuntimeError('database is gone')
+        analyzed.append(transaction_ids)
+
+    async def mark_failed(container, transaction_ids):
+        failed.append(transaction_ids)
+
+    monkeypatch.setattr(ai_tasks, 'runtime', SimpleNamespace(container=None))
+    monkeypatch.setattr(ai_tasks, 'run_async', asyncio.run)
+    monkeypatch.setattr(ai_tasks, 'analyze_transactions', analyze_transactions)
+    monkeypatch.setattr(ai_tasks, '_mark_failed', mark_failed)
+    monkeypatch.setattr(ai_tasks.cfg.analysis, 'batch_size', 2)
+    return analyzed, failed
+
+
+def test_failed_chunk_does_not_stop_the_batch(chunks):
+    analyzed, failed = chunks
+    transaction_ids = [uuid.uuid4() for _ in range(5)]
+
+    with pytest.raises(RuntimeError, match='database is gone'):
+        ai_tasks.process_transactions_batch_analysis.run(transaction_ids)
+
+    # Третья пачка проанализирована, failed помечены только строки второй
+    assert analyzed == [transaction_ids[:2], None, transaction_ids[4:]]
+    assert failed == [transaction_ids[2:4]]
@@ -0,0 +1,75 @@
+import pytest
+
+from transaction_service.services.transaction_service import validate_batch
+from tests.conftest import transaction_payload
+
+
+def test_validate_batch_maps_errors_to_item_indices():
+    items = [
+        transaction_payload(),
+        transaction_payload(withdraw='not a number'),
+        transaction_payload(),
+        transaction_payload(user_id='bad', deposit=None),
+    ]
+
+    valid, errors = validate_batch(items)
+
+    assert [str(ts.user_id) for ts in valid] == [items[0]['user_id'], items[2]['user_id']]
+    assert [error.index for error in errors] == [1, 3]
+    assert [e['loc'] for e in errors[0].errors] == [['withdraw']]
+    assert sorted(e['loc'][0] for e in errors[1].errors) == ['deposit', 'user_id']
+
+
+def test_validate_batch_non_object_item():
+    valid, errors = validate_batch([transaction_payload(), 42, 'text'])
+
+    assert len(valid) == 1
+    assert [error.index for error in errors] == [1, 2]
+    # Ошибка относится к элементу целиком - путь внутри него пустой
+    assert errors[0].errors[0]['loc'] == []
+    assert errors[0].errors[0]['type'] == 'model_type'
+
+
+def test_validate_batch_all_valid():
+    valid, errors = validate_batch([transaction_payload(), transaction_payload()])
+
+    assert len(valid) == 2
+    assert errors == []
+
+
+@pytest.mark.asyncio
+async def test_create_transactions_writes_only_valid_items(service, repository, analyzer):
+    items = [transaction_payload(), {'withdraw': '1'}, transaction_payload()]
+
+    res = await service.create_transactions(items)
+
+    assert [str(ts.user_id) for ts in res.created] == [items[0]['user_id'], items[2]['user_id']]
+    assert [error.index for error in res.errors] == [1]
+    assert analyzer.analyzed == [[ts.id for ts in repository.created]]
+
+
+@pytest.mark.asyncio
+async def test_create_transactions_all_invalid(service, repository):
+    res = await service.create_transactions([{}, None])
+
+    assert res.created == []
+    assert [error.index for error in res.errors] == [0, 1]
+    assert repository.created == []
+
+
+def test_batch_endpoint_partial_success(client):
+    res = client.post('/api/v1/transactions/batch', json=[transaction_payload(), 'text'])
+
+    assert res.status_code == 201
+    body = res.json()
+    assert len(body['created']) == 1
+    assert [error['index'] for error in body['errors']] == [1]
+
+
+def test_batch_endpoint_all_invalid(client):
+    res = client.post('/api/v1/transactions/batch', json=[{}, 42])
+
+    assert res.status_code == 422
+    body = res.json()
+    assert body['created'] == []
+    assert [error['index'] for error in body['errors']] == [0, 1]
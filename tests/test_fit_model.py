@@ -0,0 +1,80 @@
+import random
+from datetime import datetime, timedelta
+from decimal import Decimal
+from types import SimpleNamespace
+
+import pytest
+from catboost import CatBoostClassifier, CatBoostError
+
+from transaction_service.services.ai_service import build_features, fit_model, predict_many
+from transaction_service.tasks import ai_tasks
+
+ROWS = 30
+
+
+def generate(size: int) -> dict:
+    rnd = random.Random(size)
+    entry_dates = [datetime(2025, 1, 1) + timedelta(days=rnd.randrange(365)) for _ in range(size)]
+    return {
+        'entry_dates': entry_dates,
+        'receipt_dates': entry_dates,
+        'balances': [Decimal(rnd.randrange(10 ** 6)) for _ in range(size)],
+        'withdrawals': [Decimal(rnd.randrange(1, 10 ** 4)) for _ in range(size)],
+        'deposits': [Decimal(0)] * size,
+    }
+
+
+@pytest.fixture(scope='module')
+def model() -> CatBoostClassifier:
+    model = CatBoostClassifier()
+    model.load_model('model.cbm')
+    return model
+
+
+def edits(categories: list[str]):
+    columns = generate(ROWS)
+    columns['categories'] = [categories[i % len(categories)] for i in range(ROWS)]
+    return build_features(**columns)
+
+
+@pytest.mark.parametrize('covered', [1, 2])
+def test_fit_on_partial_classes_keeps_all_classes(model, covered):
+    classes = list(model.classes_)
+
+    fitted = fit_model(model, edits(classes[:covered]), iterations=5, learning_rate=0.03)
+
+    assert list(fitted.classes_) == classes
+    # Добавляются iterations деревьев, а не ещё один полный круг обучения
+    assert fitted.tree_count_ == model.tree_count_ + 5
+    assert set(predict_many(fitted, build_features(**generate(5)))) <= set(classes)
+
+
+def test_fit_on_unknown_class_fails(model):
+    with pytest.raises(CatBoostError):
+        fit_model(model, edits(['Unknown']), iterations=5, learning_rate=0.03)
+
+
+@pytest.mark.asyncio
+async def test_failed_fit_is_not_promoted(model, monkeypatch):
+    promoted, broadcast = [], []
+    model_server = SimpleNamespace(
+        get=lambda: ('base', model),
+        version='base',
+        promote=promoted.append,
+    )
+    monkeypatch.setattr(ai_tasks.celery_app.control, 'broadcast', broadcast.append)
+    columns = generate(ROWS)
+    edited = [
+        SimpleNamespace(
+            entry_date=entry_date,
+            receipt_date=receipt_date,
+            balance=balance,
+            withdraw=withdraw,
+            deposit=deposit,
+            new_category='Unknown',
+        )
+        for entry_date, receipt_date, balance, withdraw, deposit in zip(*columns.values())
+    ]
+
+    assert not await ai_tasks._train_on_edits(model_server, edited)
+    assert promoted == [] and broadcast == []
@@ -0,0 +1,87 @@
+import uuid
+from collections import namedtuple
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+import pytest
+
+from transaction_service.schemas.transaction import TRANSACTION_RESPONSE_FIELDS
+from transaction_service.utils.pagination import InvalidCursorError, decode_cursor, encode_cursor
+
+# Строка репозитория: кортеж колонок с доступом по имени, как Row
+TransactionRow = namedtuple('TransactionRow', TRANSACTION_RESPONSE_FIELDS)
+
+
+def make_rows(count: int) -> list[TransactionRow]:
+    start = datetime(2025, 1, 1)
+    user_id = uuid.uuid4()
+    return [
+        TransactionRow(
+            id=uuid.uuid4(),
+            user_id=user_id,
+            entry_date=start - timedelta(minutes=i),
+            receipt_date=start - timedelta(minutes=i),
+            withdraw=Decimal('1'),
+            deposit=Decimal('0'),
+            processing_status='completed',
+            category=None,
+            balance=Decimal('10'),
+            created_at=start,
+            expediency=None,
+        )
+        for i in range(count)
+    ]
+
+
+@pytest.mark.parametrize('receipt_date', [
+    datetime(2025, 1, 1, 10, 0),
+    datetime(2025, 12, 31, 23, 59, 59, 999999),
+])
+def test_cursor_round_trip(receipt_date):
+    transaction_id = uuid.uuid4()
+
+    cursor = encode_cursor(receipt_date, transaction_id)
+
+    assert '=' not in cursor
+    assert decode_cursor(cursor) == (receipt_date, transaction_id)
+
+
+@pytest.mark.parametrize('cursor', [
+    '',
+    'not-a-cursor',
+    encode_cursor(datetime(2025, 1, 1), uuid.uuid4())[:-4],
+])
+def test_decode_invalid_cursor(cursor):
+    with pytest.raises(InvalidCursorError):
+        decode_cursor(cursor)
+
+
+@pytest.mark.asyncio
+async def test_next_cursor_points_to_last_row_of_page(service, repository):
+    repository.rows = make_rows(3)
+
+    page = await service.get_transactions_json(
+        user_id=uuid.uuid4(), start_date=None, end_date=None, limit=2,
+    )
+
+    last = repository.rows[1]
+    assert page.count(b'"id"') == 2
+    assert f'"next_cursor":"{encode_cursor(last.receipt_date, last.id)}"'.encode() in page
+
+
+@pytest.mark.asyncio
+async def test_last_page_has_no_cursor(service, repository):
+    repository.rows = make_rows(2)
+
+    page = await service.get_transactions_json(
+        user_id=uuid.uuid4(), start_date=None, end_date=None, limit=2,
+    )
+
+    assert page.endswith(b'"next_cursor":null}')
+
+
+@pytest.mark.parametrize('query', ['limit=0', 'limit=-1', 'limit=100000', 'offset=-1'])
+def test_list_rejects_out_of_range_paging(client, query):
+    res = client.get(f'/api/v1/transactions/?user_id={uuid.uuid4()}&{query}')
+
+    assert res.status_code == 422
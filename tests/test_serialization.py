@@ -0,0 +1,51 @@
+import json
+import uuid
+from datetime import datetime
+from decimal import Decimal
+
+from transaction_service.schemas.transaction import (
+    TRANSACTION_RESPONSE_FIELDS,
+    ManyTransactionsResponse,
+    TransactionResponse,
+)
+from transaction_service.services.transaction_service import encode_transactions_page
+
+
+def transaction_row(**overrides) -> tuple:
+    # Кортеж колонок TRANSACTION_RESPONSE_FIELDS, как его отдаёт репозиторий
+    row = {
+        'id': uuid.uuid4(),
+        'user_id': uuid.uuid4(),
+        'entry_date': datetime(2025, 1, 1, 10, 0),
+        'receipt_date': datetime(2025, 1, 1, 10, 0, 30, 123456),
+        'withdraw': Decimal('123.45'),
+        'deposit': Decimal('0'),
+        'processing_status': 'completed',
+        'category': 'Супермаркеты',
+        'balance': Decimal('1000.00'),
+        'created_at': datetime(2025, 1, 1, 12, 0),
+        'expediency': 1,
+    }
+    row.update(overrides)
+    return tuple(row[name] for name in TRANSACTION_RESPONSE_FIELDS)
+
+
+def test_encode_transactions_page_matches_response_model():
+    rows = [transaction_row(), transaction_row(category=None, expediency=None)]
+
+    body = encode_transactions_page(rows, total=2, next_cursor='abc')
+
+    # Тот же JSON, что отдала бы сериализация ManyTransactionsResponse
+    expected = ManyTransactionsResponse(
+        total=2,
+        results=[TransactionResponse(**dict(zip(TRANSACTION_RESPONSE_FIELDS, row))) for row in rows],
+        next_cursor='abc',
+    )
+    assert json.loads(body) == json.loads(expected.model_dump_json())
+    assert ManyTransactionsResponse.model_validate_json(body) == expected
+
+
+def test_encode_empty_page():
+    body = encode_transactions_page([], total=None, next_cursor=None)
+
+    assert json.loads(body) == {'total': None, 'results': [], 'next_cursor': None}
@@ -0,0 +1,111 @@
+import uuid
+from decimal import Decimal
+from io import BytesIO
+
+import PyPDF2
+from PyPDF2 import PageObject
+from PyPDF2.generic import DecodedStreamObject, DictionaryObject, NameObject
+
+from transaction_service.services.statement_parsers import StatementParseError, get_parser
+from transaction_service.services.statement_parsers.base import StatementAccumulator, split_pdf
+
+OPENING = 'Баланс на 01.01.25 10 000.00 i\n'
+ROWS = [
+    '01.01.25 10:00 01.01.25 -100.00 i',
+    '02.01.25 11:30 02.01.25 + 2 500.00 i',
+    '03.01.25 12:00 04.01.25 -1 250.50 i',
+]
+
+
+def make_pdf(pages: list[list[str]]) -> bytes:
+    # Текстовый pdf: на каждой странице строки lines стандартным шрифтом
+    writer = PyPDF2.PdfWriter()
+    font = DictionaryObject({
+        NameObject('/Type'): NameObject('/Font'),
+        NameObject('/Subtype'): NameObject('/Type1'),
+        NameObject('/BaseFont'): NameObject('/Helvetica'),
+    })
+    for lines in pages:
+        page = PageObject.create_blank_page(width=600, height=800)
+        page[NameObject('/Resources')] = DictionaryObject({
+            NameObject('/Font'): DictionaryObject({NameObject('/F1'): font}),
+        })
+        content = DecodedStreamObject()
+        content.set_data(''.join(
+            f'BT /F1 10 Tf 20 {780 - 14 * i} Td ({line}) Tj ET\n' for i, line in enumerate(lines)
+        ).encode())
+        page[NameObject('/Contents')] = content
+        writer.add_page(page)
+    with BytesIO() as out:
+        writer.write(out)
+        return out.getvalue()
+
+
+def records(transactions: list[dict]) -> list[tuple]:
+    return [(ts['entry_date'], ts['withdraw'], ts['deposit'], ts['balance']) for ts in transactions]
+
+
+def feed(texts: list[str]) -> list[dict]:
+    parser = get_parser('tbank')
+    accumulator = StatementAccumulator(uuid.uuid4(), parser)
+    transactions = []
+    for text in texts:
+        transactions.extend(accumulator.feed(parser.parse_page_text(text)))
+    accumulator.close()
+    return transactions
+
+
+def test_record_split_by_page_break_is_kept():
+    row = ROWS[2]
+    split_at = row.index('04.01.25')
+
+    transactions = feed([
+        OPENING + ROWS[0] + '\n' + row[:split_at],
+        row[split_at:] + '\n' + ROWS[1],
+    ])
+
+    # Те же строки и баланс, что и без переноса страницы
+    assert records(transactions) == records(feed([OPENING + '\n'.join([ROWS[0], row, ROWS[1]])]))
+    assert len(transactions) == 3
+
+
+def test_record_split_by_page_break_before_empty_page():
+    row = ROWS[0]
+
+    transactions = feed([OPENING + row[:8], row[8:], 'Страница без записей'])
+
+    assert len(transactions) == 1
+    assert transactions[0]['entry_date'].day == 1
+
+
+def test_pages_without_split_records_are_unchanged():
+    transactions = feed([OPENING + ROWS[0], ROWS[1] + '\n' + ROWS[2]])
+
+    assert len(transactions) == 3
+
+
+def test_statement_without_opening_balance_fails():
+    try:
+        feed([ROWS[0]])
+    except StatementParseError:
+        return
+    raise AssertionError('StatementParseError not raised')
+
+
+def test_split_pdf_sends_each_chunk_only_its_pages():
+    pages = [[f'{i + 1:02d}.01.25 10:00 {i + 1:02d}.01.25 -{i + 1}.00 i'] for i in range(7)]
+    pdf_content = make_pdf(pages)
+    parser = get_parser('tbank')
+
+    chunks = split_pdf(pdf_content, pages_per_chunk=3)
+
+    assert [len(PyPDF2.PdfReader(BytesIO(chunk)).pages) for chunk in chunks] == [3, 3, 1]
+    parsed = [page for chunk in chunks for page in parser.parse_pages(chunk)]
+    assert [page.entries for page in parsed] == [page.entries for page in parser.parse_pages(pdf_content)]
+    assert [abs(page.entries[0][2]) for page in parsed] == [Decimal(i + 1) for i in range(7)]
+
+
+def test_split_pdf_keeps_short_statement_as_is():
+    pdf_content = make_pdf([[ROWS[0]]])
+
+    assert split_pdf(pdf_content, pages_per_chunk=3) == [pdf_content]
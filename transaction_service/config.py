@@ -1,8 +1,22 @@
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 
 import toml
 
 
+@dataclass
+class DatabasePoolConfig:
+    # Пул соединений engine: size постоянных соединений и до max_overflow сверх них,
+    # timeout - сколько ждать свободное соединение, recycle - пересоздавать соединения старше, секунды
+    size: int = 10
+    max_overflow: int = 5
+    timeout: float = 30.0
+    recycle: int = 1800
+    pre_ping: bool = True
+    # Кэш подготовленных запросов asyncpg на соединение; 0 - за pgbouncer в transaction mode
+    statement_cache_size: int = 100
+    echo: bool = False
+
+
 @dataclass
 class DatabaseConfig:
     user: str
@@ -10,8 +24,13 @@ class DatabaseConfig:
     name: str
     host: str
     port: int
+    # Запросы дольше slow_query_threshold секунд пишутся в лог
+    slow_query_threshold: float = 0.5
+    pool: DatabasePoolConfig = field(default_factory=DatabasePoolConfig)
 
     def __post_init__(self) -> None:
+        if isinstance(self.pool, dict):
+            self.pool = DatabasePoolConfig(**self.pool)
         self.uri = (
             f"postgresql+asyncpg://{self.user}:{self.password}@"
             f"{self.host}:{self.port}/{self.name}"
@@ -42,11 +61,143 @@ class RabbitmqConfig:
         )
 
 
+@dataclass
+class MetricsConfig:
+    # Метрики HTTP по (метод, шаблон пути, статус), а не только общий счётчик запросов
+    per_route: bool = True
+
+
+@dataclass
+class CacheConfig:
+    # Кэш GET /transactions/{id}: инвалидируется при изменении строки, поэтому TTL длинный.
+    # l1_size - записей в LRU процесса API, lock_timeout - сколько ждать чужую загрузку, секунды
+    ttl: int = 3600
+    l1_size: int = 10_000
+    lock_timeout: float = 2.0
+
+
+@dataclass
+class RateLimitConfig:
+    # limit запросов с одного IP за скользящее окно window секунд
+    limit: int = 100
+    window: int = 60
+    # Сколько заблокированных клиентов процесс помнит, чтобы отвечать 429 без Redis
+    local_cache_size: int = 10_000
+    # Лимиты отдельных ручек: "МЕТОД /префикс/пути" -> limit, выигрывает самый длинный префикс
+    routes: dict[str, int] = field(default_factory=dict)
+
+
+@dataclass
+class AnalysisConfig:
+    # Сколько транзакций воркер категоризирует за один вызов модели
+    batch_size: int = 256
+    # Очередь на категоризацию: "celery" (RabbitMQ) или "redis" (Redis Streams + stream_worker)
+    backend: str = "celery"
+    stream: str = "transactions:analysis"
+    consumer_group: str = "analyzers"
+    # Примерная длина стрима: старые подтверждённые сообщения обрезаются по XADD MAXLEN ~
+    stream_maxlen: int = 100_000
+    # Консьюмер: сообщений за XREADGROUP (не больше свободных мест), сколько обрабатывать одновременно,
+    # через сколько миллисекунд забирать неподтверждённые сообщения упавших консьюмеров
+    read_count: int = 16
+    block_ms: int = 5000
+    concurrency: int = 8
+    claim_idle_ms: int = 60_000
+
+
+@dataclass
+class PublisherConfig:
+    # Буфер API для backend = "celery": сколько запросов на анализ держать до публикации,
+    # сколько транзакций отправлять одним сообщением и как долго копить группу, секунды
+    max_pending: int = 10_000
+    max_batch: int = 256
+    flush_interval: float = 0.05
+
+
+@dataclass
+class OutboxConfig:
+    # outbox_relay: сколько задач забирать за раз и как часто опрашивать outbox, секунды.
+    # Задачу, не выполненную за publish_delay после записи, релей отправляет сам и повторяет
+    # через retry_delay до max_attempts раз, потом транзакция помечается failed.
+    # in_progress строки без задачи старше stuck_after ставятся в outbox раз в stuck_check_interval
+    batch_size: int = 500
+    poll_interval: float = 1.0
+    publish_delay: float = 30.0
+    retry_delay: float = 120.0
+    max_attempts: int = 5
+    stuck_after: float = 600.0
+    stuck_check_interval: float = 60.0
+
+
+@dataclass
+class BatchConfig:
+    # Сколько транзакций можно прислать одним POST /transactions/batch
+    max_items: int = 1000
+
+
+@dataclass
+class ExportConfig:
+    # Выгрузка истории читается серверным курсором порциями по batch_size строк,
+    # gzip_level - уровень сжатия для ?gzip=true
+    batch_size: int = 2000
+    gzip_level: int = 6
+
+
+@dataclass
+class ParserConfig:
+    # Процессы для разбора pdf-выписок и сколько страниц отдаётся процессу за раз
+    workers: int = 4
+    pages_per_chunk: int = 16
+
+
+@dataclass
+class ModelConfig:
+    # Каталог с версиями модели (общий для API и воркеров) и модель, с которой сервис стартует
+    registry_path: str = "models"
+    base_path: str = "model.cbm"
+    # Как часто воркер проверяет, не опубликована ли новая версия, секунды
+    reload_interval: float = 5.0
+    # Загружать модель в главном процессе celery до fork: дочерние процессы prefork делят её
+    # страницы copy-on-write, новую версию раздаёт команда reload_model с перезапуском пула
+    preload: bool = True
+
+
+@dataclass
+class RetrainConfig:
+    # Правки категорий копятся window_seconds секунд или до max_edits штук, потом одно обучение;
+    # модель дообучается, только если правок больше fit_threshold.
+    # Дообучение - fit_iterations деревьев с шагом fit_learning_rate поверх текущей модели
+    window_seconds: int = 300
+    max_edits: int = 50
+    fit_threshold: int = 10
+    fit_iterations: int = 20
+    fit_learning_rate: float = 0.03
+
+
+@dataclass
+class WorkerConfig:
+    # Задачи процесса celery-воркера идут на одном event loop и делят пул [db.pool].
+    # shutdown_timeout - сколько ждать закрытия пула при остановке
+    shutdown_timeout: float = 30.0
+
+
 @dataclass
 class Config:
     db: DatabaseConfig
     redis: RedisConfig
     rabbitmq: RabbitmqConfig
+    rate_limit: RateLimitConfig
+    metrics: MetricsConfig
+    cache: CacheConfig
+    analysis: AnalysisConfig
+    publisher: PublisherConfig
+    outbox: OutboxConfig
+    batch: BatchConfig
+    export: ExportConfig
+    parser: ParserConfig
+    model: ModelConfig
+    retrain: RetrainConfig
+    worker: WorkerConfig
 
 
 def load_config(config_path: str) -> Config:
@@ -56,4 +207,16 @@ def load_config(config_path: str) -> Config:
         db=DatabaseConfig(**data["db"]),
         redis=RedisConfig(**data["redis"]),
         rabbitmq=RabbitmqConfig(**data["rabbitmq"]),
+        rate_limit=RateLimitConfig(**data.get("rate_limit", {})),
+        metrics=MetricsConfig(**data.get("metrics", {})),
+        cache=CacheConfig(**data.get("cache", {})),
+        analysis=AnalysisConfig(**data.get("analysis", {})),
+        publisher=PublisherConfig(**data.get("publisher", {})),
+        outbox=OutboxConfig(**data.get("outbox", {})),
+        batch=BatchConfig(**data.get("batch", {})),
+        export=ExportConfig(**data.get("export", {})),
+        parser=ParserConfig(**data.get("parser", {})),
+        model=ModelConfig(**data.get("model", {})),
+        retrain=RetrainConfig(**data.get("retrain", {})),
+        worker=WorkerConfig(**data.get("worker", {})),
     )
@@ -1,11 +1,17 @@
+from dishka import FromDishka
+from dishka.integrations.fastapi import DishkaRoute
 from fastapi import APIRouter
 from prometheus_client import CONTENT_TYPE_LATEST, generate_latest
 from starlette.requests import Request
 from starlette.responses import Response
 
-router = APIRouter()
+from transaction_service.services.model_registry import ModelRegistry
+from transaction_service.utils.metrics import MODEL_ACTIVE_VERSION
+
+router = APIRouter(route_class=DishkaRoute)
 
 
 @router.get("/metrics")
-async def metrics(_: Request) -> Response:
+async def metrics(_: Request, registry: FromDishka[ModelRegistry]) -> Response:
+    MODEL_ACTIVE_VERSION.info({'version': registry.active_version()})
     return Response(generate_latest(), headers={'Content-Type': CONTENT_TYPE_LATEST})
@@ -1,19 +1,64 @@
-from fastapi import Request
-from starlette.middleware.base import BaseHTTPMiddleware
+import time
+from typing import Optional
 
-from transaction_service.utils.metrics import REQUESTS_TOTAL
+from dishka import AsyncContainer
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
 
+from transaction_service.config import Config
+from transaction_service.utils.metrics import (
+    HTTP_REQUEST_DURATION,
+    HTTP_REQUESTS_BY_ROUTE,
+    REQUESTS_TOTAL,
+)
 
-class RequestCountMiddleware(BaseHTTPMiddleware):
-    def __init__(
-            self,
-            app,
-    ):
-        super().__init__(app)
+# Метка path для запросов, не попавших ни в один APIRoute (404, статика)
+UNMATCHED_ROUTE = '<unmatched>'
+
+
+class RequestCountMiddleware:
+    # Чистый ASGI без BaseHTTPMiddleware: ни лишней задачи, ни обёртки над телом ответа.
+    # В режиме per_route считает запросы и время по (метод, шаблон пути, статус): шаблон
+    # берётся из scope['route'], который FastAPI кладёт туда при маршрутизации, поэтому
+    # /transactions/{transaction_id} - одна серия, а не по серии на id.
+    # Режим берётся из [metrics] конфига один раз, на старте приложения (lifespan)
+    def __init__(self, app: ASGIApp, ioc_container: AsyncContainer):
+        self.app = app
+        self._ioc_container = ioc_container
+        self.per_route: Optional[bool] = None
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope['type'] == 'lifespan':
+            await self._resolve_dependencies()
+        if scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+
+        if self.per_route is None:
+            await self._resolve_dependencies()
 
-    async def dispatch(self, request: Request, call_next):
         REQUESTS_TOTAL.inc()
+        if not self.per_route:
+            await self.app(scope, receive, send)
+            return
+
+        start_time = time.perf_counter()
+        status_code = 500
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal status_code
+            if message['type'] == 'http.response.start':
+                status_code = message['status']
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            route = scope.get('route')
+            path = getattr(route, 'path', UNMATCHED_ROUTE)
+            method = scope['method']
+            HTTP_REQUESTS_BY_ROUTE.labels(method, path, status_code).inc()
+            HTTP_REQUEST_DURATION.labels(method, path).observe(time.perf_counter() - start_time)
 
-        # process the request and get the response
-        response = await call_next(request)
-        return response
+    async def _resolve_dependencies(self) -> None:
+        cfg = await self._ioc_container.get(Config)
+        self.per_route = cfg.metrics.per_route
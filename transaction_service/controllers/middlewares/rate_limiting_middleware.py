@@ -1,57 +1,53 @@
-import time
-from contextlib import suppress
+import logging
+import math
+from typing import Optional
 
 from dishka import AsyncContainer
-from redis.asyncio import Redis
-from starlette.middleware.base import BaseHTTPMiddleware
-from starlette.requests import Request
+from redis.exceptions import RedisError
 from starlette.responses import JSONResponse
+from starlette.types import ASGIApp, Receive, Scope, Send
 
-# Максимум 100 запросов в минуту от одного клиента
-RATE_LIMIT = 100
-TIME_WINDOW = 60
+from transaction_service.utils.rate_limiter import SlidingWindowRateLimiter
 
+logger = logging.getLogger(__name__)
 
-class RateLimitMiddleware(BaseHTTPMiddleware):
-    def __init__(self, app, ioc_container: AsyncContainer):
-        super().__init__(app)
+
+class RateLimitMiddleware:
+    # Чистый ASGI. Лимиты - секция [rate_limit] конфига, см. SlidingWindowRateLimiter.
+    # Лимитер достаётся из контейнера один раз, на старте приложения (lifespan)
+    def __init__(self, app: ASGIApp, ioc_container: AsyncContainer):
+        self.app = app
         self._ioc_container = ioc_container
-        self._cache = {}
+        self._rate_limiter: Optional[SlidingWindowRateLimiter] = None
 
-    async def dispatch(self, request: Request, call_next):
-        redis_client = await self._ioc_container.get(Redis)
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope['type'] == 'lifespan':
+            await self._resolve_dependencies()
+        if scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
 
-        client_ip = request.client.host
-        redis_key = f"ratelimit:{client_ip}"
+        # Без lifespan (например, в тестовом клиенте) - при первом запросе
+        if self._rate_limiter is None:
+            await self._resolve_dependencies()
 
+        client = scope['client'][0] if scope.get('client') else 'unknown'
         try:
-            current_count = await redis_client.get(redis_key)
-            if not current_count:
-                await redis_client.setex(redis_key, RATE_LIMIT, 1)
-                response = await call_next(request)
-                return response
-
-            current_count = await redis_client.incr(redis_key)
-            print(f"{redis_key}: {current_count}")
-
-            if int(current_count) > RATE_LIMIT:
-                if not self._cache.get(redis_key):
-                    self._cache[redis_key] = time.time()
-
-                return JSONResponse(
-                    status_code=429,
-                    content={"detail": "Too Many requests"},
-                    headers={"Retry-After": str(TIME_WINDOW - (time.time() - self._cache[redis_key])),}
-                )
-
-            with suppress(KeyError):
-                del self._cache[redis_key]
-
-            response = await call_next(request)
-            return response
-        except Exception as e:
-            print(f"Unexpected error: {str(e)}")
-            return JSONResponse(
-                status_code=500,
-                content={"detail": f"Internal Server Error: {str(e)}"},
+            retry_after = await self._rate_limiter.hit(client, scope['method'], scope['path'])
+        except RedisError:
+            # Без Redis лимит не проверить - пропускаем запрос, а не отказываем всем
+            logger.exception('Rate limiter is unavailable')
+            retry_after = None
+
+        if retry_after is not None:
+            response = JSONResponse(
+                status_code=429,
+                content={"detail": "Too Many requests"},
+                headers={"Retry-After": str(math.ceil(retry_after))},
             )
+            await response(scope, receive, send)
+            return
+        await self.app(scope, receive, send)
+
+    async def _resolve_dependencies(self) -> None:
+        self._rate_limiter = await self._ioc_container.get(SlidingWindowRateLimiter)
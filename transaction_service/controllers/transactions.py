@@ -1,56 +1,127 @@
 from datetime import datetime
-from typing import Annotated, Optional
+from typing import Annotated, Any, Literal, Optional
 from uuid import UUID
 
 from dishka import FromDishka
 from dishka.integrations.fastapi import DishkaRoute
-from fastapi import APIRouter, HTTPException, status, Query, UploadFile
-from fastapi.responses import Response
-from redis.asyncio import Redis
-
-from transaction_service.schemas.transaction import TransactionCreate, TransactionResponse, ManyTransactionsResponse
+from fastapi import APIRouter, Body, HTTPException, status, Query, UploadFile
+from fastapi.responses import StreamingResponse
+
+from transaction_service.config import Config
+from transaction_service.schemas.transaction import (
+    BatchCreateResponse,
+    TransactionCreate,
+    TransactionResponse,
+    ManyTransactionsResponse,
+)
+from transaction_service.services.statement_parsers import StatementParseError
+from transaction_service.services.transaction_export import EXPORT_MEDIA_TYPES, TransactionExporter
 from transaction_service.services.transaction_service import TransactionService
-from transaction_service.utils.cache import cache
 from transaction_service.utils.metrics import (
     CREATE_TRANSACTION_METHOD_DURATION,
+    CREATE_TRANSACTIONS_BATCH_METHOD_DURATION,
     GET_ALL_TRANSACTIONS_METHOD_DURATION,
     measure_latency,
 )
+from transaction_service.utils.pagination import InvalidCursorError
+from transaction_service.utils.responses import JSONBytesResponse
 
 router = APIRouter(route_class=DishkaRoute)
 
+# Наибольший размер страницы GET /transactions/
+MAX_PAGE_LIMIT = 500
 
-@router.post("/transactions/", response_model=TransactionResponse)
+
+@router.post(
+    "/transactions/",
+    response_model=TransactionResponse,
+    response_class=JSONBytesResponse,
+    status_code=status.HTTP_201_CREATED,
+)
 @measure_latency(CREATE_TRANSACTION_METHOD_DURATION)
 async def create_transaction(
         transaction: TransactionCreate,
         service: FromDishka[TransactionService]
 ):
     new_transaction = await service.create_transaction(transaction)
-    return Response(
+    return JSONBytesResponse(
         status_code=status.HTTP_201_CREATED,
-        content=new_transaction.model_dump_json(indent=4)
+        content=new_transaction.model_dump_json().encode(),
+    )
+
+
+@router.post("/transactions/batch", response_model=BatchCreateResponse, response_class=JSONBytesResponse)
+@measure_latency(CREATE_TRANSACTIONS_BATCH_METHOD_DURATION)
+async def create_transactions_batch(
+        items: Annotated[list[Any], Body()],
+        service: FromDishka[TransactionService],
+        cfg: FromDishka[Config],
+):
+    # Элементы валидирует сервис: ошибка в одном не отклоняет весь запрос
+    if len(items) > cfg.batch.max_items:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"Batch is limited to {cfg.batch.max_items} transactions",
+        )
+    res = await service.create_transactions(items)
+    return JSONBytesResponse(
+        status_code=status.HTTP_201_CREATED if res.created else status.HTTP_422_UNPROCESSABLE_ENTITY,
+        content=res.model_dump_json().encode(),
     )
 
 
-@router.get("/transactions/", response_model=ManyTransactionsResponse)
+@router.get("/transactions/", response_model=ManyTransactionsResponse, response_class=JSONBytesResponse)
 @measure_latency(GET_ALL_TRANSACTIONS_METHOD_DURATION)
 async def create_transaction(
         user_id: UUID,
         service: FromDishka[TransactionService],
         start_date: datetime | None = None,
         end_date: datetime | None = None,
-        offset: int = 0,
-        limit: int = 10,
+        offset: Annotated[int, Query(ge=0)] = 0,
+        limit: Annotated[int, Query(ge=1, le=MAX_PAGE_LIMIT)] = 10,
+        cursor: str | None = None,
+        include_total: bool = True,
 ):
-    user_transactions = await service.get_transactions_by_user_id(
-        user_id=user_id,
-        start_date=start_date,
-        end_date=end_date,
-        limit=limit,
-        offset=offset,
+    try:
+        # Страница кодируется в JSON прямо из строк базы, без моделей и повторной сериализации
+        transactions_json = await service.get_transactions_json(
+            user_id=user_id,
+            start_date=start_date,
+            end_date=end_date,
+            limit=limit,
+            offset=offset,
+            cursor=cursor,
+            include_total=include_total,
+        )
+    except InvalidCursorError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    return JSONBytesResponse(content=transactions_json)
+
+
+# Объявлен до /transactions/{transaction_id}, иначе путь разберётся как id транзакции
+@router.get("/transactions/export")
+async def export_transactions(
+        user_id: UUID,
+        exporter: FromDishka[TransactionExporter],
+        start_date: datetime | None = None,
+        end_date: datetime | None = None,
+        format: Literal['ndjson', 'csv'] = 'ndjson',
+        gzip: bool = False,
+):
+    headers = {'Content-Disposition': f'attachment; filename="transactions.{format}"'}
+    if gzip:
+        headers['Content-Encoding'] = 'gzip'
+    return StreamingResponse(
+        exporter.export(
+            user_id=user_id,
+            export_format=format,
+            start_date=start_date,
+            end_date=end_date,
+            gzip=gzip,
+        ),
+        media_type=EXPORT_MEDIA_TYPES[format],
+        headers=headers,
     )
-    return user_transactions
 
 
 @router.post("/transactions/load-account-statement/")
@@ -61,21 +132,27 @@ async def process_account_statement(
         service: FromDishka[TransactionService]
 ):
     content = await file.read()
-    res = await service.process_account_statement(user_id=user_id, bank=bank, pdf_file=content)
+    try:
+        res = await service.process_account_statement(user_id=user_id, bank=bank, pdf_file=content)
+    except StatementParseError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
     return res
 
 
-@router.get("/transactions/{transaction_id}", response_model=TransactionResponse)
-@cache(ttl=2)
+@router.get(
+    "/transactions/{transaction_id}",
+    response_model=TransactionResponse,
+    response_class=JSONBytesResponse,
+)
 async def get_transaction(
         transaction_id: UUID,
-        redis_client: FromDishka[Redis],  # noqa
         service: FromDishka[TransactionService]
 ):
-    transaction = await service.get_transaction(transaction_id)
-    if not transaction:
+    # Кэш хранит готовый JSON ответа - отдаём байты без повторной сериализации
+    transaction_json = await service.get_transaction_json(transaction_id)
+    if not transaction_json:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Transaction not found")
-    return transaction
+    return JSONBytesResponse(content=transaction_json)
 
 
 @router.patch("/transactions/{transaction_id}", response_model=TransactionResponse)
@@ -1,18 +1,31 @@
+import multiprocessing
 import os
-from collections.abc import AsyncGenerator
+from collections.abc import AsyncGenerator, Iterable
+from concurrent.futures import ProcessPoolExecutor
 
 from dishka import Provider, Scope, make_async_container, provide
 from redis.asyncio import Redis
-from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_sessionmaker
 
 from transaction_service.config import Config, load_config
 from transaction_service.repositories.transaction_repository import TransactionRepository
 from transaction_service.services.transaction_service import (
+    ModelRetrainer,
     TransactionAnalyzer,
+    TransactionCache,
     TransactionService,
     TransactionGateway,
 )
-from transaction_service.tasks.ai_tasks import AIRemoteTransactionAnalyzer
+from transaction_service.services.model_registry import ModelRegistry
+from transaction_service.services.transaction_export import TransactionExporter
+from transaction_service.services.retrain_scheduler import RetrainScheduler
+from transaction_service.services.statement_parsers import AccountStatementParser
+from transaction_service.tasks.producer import AIRemoteTransactionAnalyzer
+from transaction_service.tasks.publisher import BufferedTransactionAnalyzer
+from transaction_service.tasks.stream_analyzer import RedisStreamTransactionAnalyzer
+from transaction_service.utils.cache import RedisTransactionCache
+from transaction_service.utils.database import create_engine
+from transaction_service.utils.rate_limiter import SlidingWindowRateLimiter
 
 
 def config_provider() -> Provider:
@@ -28,11 +41,17 @@ class RedisProvider(Provider):
     async def get_redis_client(self, cfg: Config) -> Redis:
         return Redis.from_url(cfg.redis.uri)
 
+    @provide(scope=Scope.APP)
+    def get_rate_limiter(self, cfg: Config, redis_client: Redis) -> SlidingWindowRateLimiter:
+        return SlidingWindowRateLimiter(redis_client, cfg.rate_limit)
+
 
 class DatabaseProvider(Provider):
     @provide(scope=Scope.APP)
-    async def get_engine(self, cfg: Config) -> AsyncEngine:
-        return create_async_engine(cfg.db.uri, echo=True)
+    async def get_engine(self, cfg: Config) -> AsyncGenerator[AsyncEngine, None]:
+        engine = create_engine(cfg.db, application_name='transaction_service_api')
+        yield engine
+        await engine.dispose()
 
     @provide(scope=Scope.APP)
     def get_sessionmaker(self, engine: AsyncEngine) -> async_sessionmaker:
@@ -47,28 +66,125 @@ class DatabaseProvider(Provider):
             yield session
 
 
+class StatementParserProvider(Provider):
+    @provide(scope=Scope.APP)
+    def get_executor(self, cfg: Config) -> Iterable[ProcessPoolExecutor]:
+        # spawn, а не fork: форкать процесс с работающим event loop и пулом соединений небезопасно
+        executor = ProcessPoolExecutor(
+            max_workers=cfg.parser.workers,
+            mp_context=multiprocessing.get_context('spawn'),
+        )
+        yield executor
+        executor.shutdown(cancel_futures=True)
+
+    @provide(scope=Scope.APP)
+    def get_statement_parser(self, cfg: Config, executor: ProcessPoolExecutor) -> AccountStatementParser:
+        return AccountStatementParser(executor, pages_per_chunk=cfg.parser.pages_per_chunk)
+
+
+class ModelRegistryProvider(Provider):
+    @provide(scope=Scope.APP)
+    def get_model_registry(self, cfg: Config) -> ModelRegistry:
+        return ModelRegistry(cfg.model.registry_path, base_model_path=cfg.model.base_path)
+
+
 class TransactionProvider(Provider):
     @provide(scope=Scope.REQUEST)
     def get_transaction_gateway(self, session: AsyncSession) -> TransactionGateway:
         return TransactionRepository(session)
 
+    @provide(scope=Scope.APP)
+    def get_transaction_exporter(
+            self,
+            cfg: Config,
+            sessionmaker: async_sessionmaker,
+    ) -> TransactionExporter:
+        return TransactionExporter(
+            sessionmaker,
+            TransactionRepository,
+            batch_size=cfg.export.batch_size,
+            gzip_level=cfg.export.gzip_level,
+        )
+
+    @provide(scope=Scope.APP)
+    async def get_financial_category_analyzer(
+            self,
+            cfg: Config,
+            redis_client: Redis,
+    ) -> AsyncGenerator[TransactionAnalyzer, None]:
+        if cfg.analysis.backend == 'redis':
+            yield RedisStreamTransactionAnalyzer(
+                redis_client,
+                cfg.analysis,
+                fit_delegate=AIRemoteTransactionAnalyzer(),
+            )
+            return
+
+        # Публикация в RabbitMQ уходит из запроса в фоновую задачу; при остановке буфер дописывается
+        analyzer = BufferedTransactionAnalyzer(
+            max_pending=cfg.publisher.max_pending,
+            max_batch=cfg.publisher.max_batch,
+            flush_interval=cfg.publisher.flush_interval,
+        )
+        analyzer.start()
+        yield analyzer
+        await analyzer.close()
+
+    @provide(scope=Scope.APP)
+    async def get_transaction_cache(
+            self,
+            cfg: Config,
+            redis_client: Redis,
+    ) -> AsyncGenerator[TransactionCache, None]:
+        cache = RedisTransactionCache(
+            redis_client,
+            ttl=cfg.cache.ttl,
+            l1_size=cfg.cache.l1_size,
+            lock_timeout=cfg.cache.lock_timeout,
+        )
+        # Подписка на инвалидации, чтобы чистить L1 этого процесса
+        cache.start()
+        yield cache
+        await cache.close()
+
     @provide(scope=Scope.REQUEST)
-    def get_financial_category_analyzer(self) -> TransactionAnalyzer:
-        return AIRemoteTransactionAnalyzer()
+    def get_model_retrainer(
+            self,
+            cfg: Config,
+            redis_client: Redis,
+            transaction_analyzer: TransactionAnalyzer,
+    ) -> ModelRetrainer:
+        return RetrainScheduler(
+            redis_client,
+            transaction_analyzer,
+            window_seconds=cfg.retrain.window_seconds,
+            max_edits=cfg.retrain.max_edits,
+        )
 
     @provide(scope=Scope.REQUEST)
     def get_transaction_service(
             self,
             repository: TransactionGateway,
             transaction_analyzer: TransactionAnalyzer,
+            statement_parser: AccountStatementParser,
+            model_retrainer: ModelRetrainer,
+            cache: TransactionCache,
     ) -> TransactionService:
-        return TransactionService(repository, transaction_analyzer)
+        return TransactionService(
+            repository,
+            transaction_analyzer,
+            statement_parser,
+            model_retrainer,
+            cache,
+        )
 
 
 def setup_di():
     return make_async_container(
         config_provider(),
         DatabaseProvider(),
+        StatementParserProvider(),
+        ModelRegistryProvider(),
         TransactionProvider(),
         RedisProvider()
     )
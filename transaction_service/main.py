@@ -29,7 +29,7 @@ def create_app(ioc_container: AsyncContainer):
     setup_dishka(container=ioc_container, app=application)
     application.container = ioc_container
 
-    application.add_middleware(RequestCountMiddleware)
+    application.add_middleware(RequestCountMiddleware, ioc_container=ioc_container)
     application.add_middleware(RateLimitMiddleware, ioc_container=ioc_container)
 
     application.include_router(transactions_router, prefix="/api/v1")
@@ -0,0 +1,41 @@
+"""User category counters
+
+Revision ID: 5b7e2c9d41a3
+Revises: 179e2051663c
+Create Date: 2026-10-17 12:40:11.204518
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5b7e2c9d41a3'
+down_revision: Union[str, None] = '179e2051663c'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('user_category_counters',
+    sa.Column('user_id', sa.UUID(), nullable=False),
+    sa.Column('category', sa.String(), nullable=False),
+    sa.Column('transactions_count', sa.BIGINT(), nullable=False),
+    sa.PrimaryKeyConstraint('user_id', 'category')
+    )
+    op.execute(
+        """
+        insert into user_category_counters (user_id, category, transactions_count)
+        select user_id, coalesce(category, ''), count(*)
+        from transactions
+        group by user_id, coalesce(category, '')
+        """
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('user_category_counters')
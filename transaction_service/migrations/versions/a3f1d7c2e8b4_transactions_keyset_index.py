@@ -0,0 +1,41 @@
+"""Transactions keyset pagination index
+
+Revision ID: a3f1d7c2e8b4
+Revises: 5b7e2c9d41a3
+Create Date: 2026-10-17 13:05:42.918334
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a3f1d7c2e8b4'
+down_revision: Union[str, None] = '5b7e2c9d41a3'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # CONCURRENTLY не блокирует запись в transactions, но не работает внутри транзакции
+    with op.get_context().autocommit_block():
+        op.create_index(
+            'ix_transactions_user_id_receipt_date_id',
+            'transactions',
+            ['user_id', sa.text('receipt_date DESC'), sa.text('id DESC')],
+            unique=False,
+            postgresql_concurrently=True,
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.get_context().autocommit_block():
+        op.drop_index(
+            'ix_transactions_user_id_receipt_date_id',
+            table_name='transactions',
+            postgresql_concurrently=True,
+        )
@@ -0,0 +1,49 @@
+"""Withdrawal daily stats
+
+Revision ID: c91e4b27d5f0
+Revises: a3f1d7c2e8b4
+Create Date: 2026-10-17 13:32:07.551206
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c91e4b27d5f0'
+down_revision: Union[str, None] = 'a3f1d7c2e8b4'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('withdrawal_daily_stats',
+    sa.Column('user_id', sa.UUID(), nullable=False),
+    sa.Column('category', sa.String(), nullable=False),
+    sa.Column('day', sa.Date(), nullable=False),
+    sa.Column('withdraw_sum', sa.DECIMAL(), nullable=False),
+    sa.Column('transactions_count', sa.BIGINT(), nullable=False),
+    sa.PrimaryKeyConstraint('user_id', 'category', 'day')
+    )
+    op.execute(
+        """
+        insert into withdrawal_daily_stats (user_id, category, day, withdraw_sum, transactions_count)
+        select user_id, coalesce(category, ''), entry_date::date, sum(withdraw), count(*)
+        from transactions
+        where entry_date is not null
+        group by user_id, coalesce(category, ''), entry_date::date
+        union all
+        select user_id, '*', entry_date::date, sum(withdraw), count(*)
+        from transactions
+        where entry_date is not null
+        group by user_id, entry_date::date
+        """
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('withdrawal_daily_stats')
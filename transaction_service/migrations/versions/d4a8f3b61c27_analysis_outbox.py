@@ -0,0 +1,56 @@
+"""Analysis outbox
+
+Revision ID: d4a8f3b61c27
+Revises: c91e4b27d5f0
+Create Date: 2026-10-17 15:04:51.318442
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd4a8f3b61c27'
+down_revision: Union[str, None] = 'c91e4b27d5f0'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('analysis_outbox',
+    sa.Column('id', sa.BIGINT(), autoincrement=True, nullable=False),
+    sa.Column('transaction_id', sa.UUID(), nullable=False),
+    sa.Column('created_at', sa.DateTime(), server_default=sa.text('now()'), nullable=False),
+    sa.Column('attempts', sa.INTEGER(), server_default='0', nullable=False),
+    sa.Column('retry_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['transaction_id'], ['transactions.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(
+        op.f('ix_analysis_outbox_transaction_id'), 'analysis_outbox', ['transaction_id'], unique=False
+    )
+    # Уже зависшие in_progress строки outbox_relay найдёт по этому индексу и поставит в outbox сам
+    with op.get_context().autocommit_block():
+        op.create_index(
+            'ix_transactions_in_progress_created_at',
+            'transactions',
+            ['created_at'],
+            unique=False,
+            postgresql_where=sa.text("processing_status = 'in_progress'"),
+            postgresql_concurrently=True,
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.get_context().autocommit_block():
+        op.drop_index(
+            'ix_transactions_in_progress_created_at',
+            table_name='transactions',
+            postgresql_concurrently=True,
+        )
+    op.drop_index(op.f('ix_analysis_outbox_transaction_id'), table_name='analysis_outbox')
+    op.drop_table('analysis_outbox')
@@ -0,0 +1,45 @@
+"""User balance summary
+
+Revision ID: e7b2c5a94d18
+Revises: d4a8f3b61c27
+Create Date: 2026-10-17 18:21:43.902617
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e7b2c5a94d18'
+down_revision: Union[str, None] = 'd4a8f3b61c27'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('user_balance_summary',
+    sa.Column('user_id', sa.UUID(), nullable=False),
+    sa.Column('balance', sa.DECIMAL(), nullable=True),
+    sa.Column('balance_receipt_date', sa.DateTime(), nullable=True),
+    sa.Column('avg_withdrawal', sa.DECIMAL(), nullable=True),
+    sa.Column('avg_computed_on', sa.Date(), nullable=True),
+    sa.PrimaryKeyConstraint('user_id')
+    )
+    # Среднее не заполняем: avg_computed_on is null, его посчитает первое чтение
+    op.execute(
+        """
+        insert into user_balance_summary (user_id, balance, balance_receipt_date)
+        select distinct on (user_id) user_id, balance, receipt_date
+        from transactions
+        where receipt_date is not null
+        order by user_id, receipt_date desc
+        """
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('user_balance_summary')
@@ -1,7 +1,14 @@
+from .aggregates import UserBalanceSummary, UserCategoryCounter, WithdrawalDailyStats
 from .base import Base
-from .transaction import Transaction
+from .outbox import AnalysisOutbox
+from .transaction import EditedTransaction, Transaction
 
 __all__ = (
+    "AnalysisOutbox",
     "Base",
+    "EditedTransaction",
     "Transaction",
+    "UserBalanceSummary",
+    "UserCategoryCounter",
+    "WithdrawalDailyStats",
 )
@@ -0,0 +1,38 @@
+from sqlalchemy import UUID, BIGINT, Column, Date, DateTime, DECIMAL, String
+
+from .base import Base
+
+# Категория для ещё не проанализированных транзакций (category is NULL в transactions)
+UNCATEGORIZED = ''
+# Сводная категория дневной статистики - все транзакции пользователя
+ALL_CATEGORIES = '*'
+
+
+class UserCategoryCounter(Base):
+    __tablename__ = "user_category_counters"
+
+    user_id = Column(UUID, primary_key=True)
+    category = Column(String, primary_key=True)
+    transactions_count = Column(BIGINT, nullable=False, default=0)
+
+
+class WithdrawalDailyStats(Base):
+    __tablename__ = "withdrawal_daily_stats"
+
+    user_id = Column(UUID, primary_key=True)
+    category = Column(String, primary_key=True)
+    day = Column(Date, primary_key=True)
+    withdraw_sum = Column(DECIMAL, nullable=False, default=0)
+    transactions_count = Column(BIGINT, nullable=False, default=0)
+
+
+class UserBalanceSummary(Base):
+    # Сводка для финансовой подушки: баланс из транзакции с самой поздней receipt_date
+    # и среднее списание за окно, пересчитанное на дату avg_computed_on
+    __tablename__ = "user_balance_summary"
+
+    user_id = Column(UUID, primary_key=True)
+    balance = Column(DECIMAL, nullable=True)
+    balance_receipt_date = Column(DateTime, nullable=True)
+    avg_withdrawal = Column(DECIMAL, nullable=True)
+    avg_computed_on = Column(Date, nullable=True)
@@ -0,0 +1,20 @@
+from sqlalchemy import UUID, BIGINT, INTEGER, Column, DateTime, ForeignKey, func
+
+from .base import Base
+
+
+class AnalysisOutbox(Base):
+    # Задачи на категоризацию, записанные в одной транзакции со строками transactions.
+    # Строка живёт, пока воркер не сохранит результат; потерянные публикации переотправляет outbox_relay
+    __tablename__ = "analysis_outbox"
+
+    id = Column(BIGINT, primary_key=True, autoincrement=True)
+    transaction_id = Column(
+        UUID,
+        ForeignKey('transactions.id', ondelete='CASCADE'),
+        nullable=False,
+        index=True,
+    )
+    created_at = Column(DateTime, nullable=False, server_default=func.now())
+    attempts = Column(INTEGER, nullable=False, server_default='0')
+    retry_at = Column(DateTime, nullable=True)
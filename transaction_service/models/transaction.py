@@ -1,7 +1,7 @@
 import uuid
 from datetime import datetime
 
-from sqlalchemy import UUID, INTEGER, Column, DateTime, DECIMAL, String
+from sqlalchemy import UUID, INTEGER, Column, DateTime, DECIMAL, Index, String
 
 from .base import Base
 
@@ -21,6 +21,17 @@ class Transaction(Base):
     balance = Column(DECIMAL, nullable=True)
     created_at = Column(DateTime, default=datetime.now)
 
+    __table_args__ = (
+        # Страницы GET /transactions/ - диапазон этого индекса по курсору (receipt_date, id)
+        Index('ix_transactions_user_id_receipt_date_id', user_id, receipt_date.desc(), id.desc()),
+        # Зависшие in_progress строки для outbox_relay: частичный индекс почти пуст в норме
+        Index(
+            'ix_transactions_in_progress_created_at',
+            created_at,
+            postgresql_where=processing_status == 'in_progress',
+        ),
+    )
+
 
 class EditedTransaction(Base):
     __tablename__ = "edited_transactions"
@@ -0,0 +1,272 @@
+from collections import Counter, defaultdict
+from collections.abc import Iterable
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Optional
+from uuid import UUID
+
+from sqlalchemy import Date, case, cast, delete, func, insert, or_, select, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from transaction_service.models.aggregates import (
+    ALL_CATEGORIES,
+    UNCATEGORIZED,
+    UserBalanceSummary,
+    UserCategoryCounter,
+    WithdrawalDailyStats,
+)
+from transaction_service.models.transaction import Transaction
+
+# Ограничение PostgreSQL - 32767 параметров на запрос, в строке агрегата их до пяти
+UPSERT_CHUNK_SIZE = 1000
+# Окно среднего списания для финансовой подушки, в месяцах
+SAFETY_CUSHION_MONTHS = 3
+
+
+class AggregatesRepository:
+    # Агрегаты поверх transactions. Пишутся в той же сессии (и транзакции), что и сами строки,
+    # поэтому коммит - забота TransactionRepository
+    def __init__(self, session: AsyncSession):
+        self.session = session
+
+    async def track_inserted(
+            self,
+            rows: Iterable[tuple[
+                UUID, Optional[str], Optional[datetime], Decimal, datetime, Optional[Decimal]
+            ]],
+    ):
+        # rows: (user_id, category, entry_date, withdraw, receipt_date, balance) новых транзакций
+        counters = Counter()
+        stats = defaultdict(lambda: [Decimal(), 0])
+        balances = {}
+        for user_id, category, entry_date, withdraw, receipt_date, balance in rows:
+            category = category or UNCATEGORIZED
+            counters[(user_id, category)] += 1
+            if entry_date is not None:
+                # Корзина '*' - все транзакции пользователя за день, для среднего по пользователю
+                for bucket in (category, ALL_CATEGORIES):
+                    stats[(user_id, bucket, entry_date.date())][0] += withdraw
+                    stats[(user_id, bucket, entry_date.date())][1] += 1
+            latest = balances.get(user_id)
+            if latest is None or receipt_date >= latest[0]:
+                balances[user_id] = (receipt_date, balance)
+
+        # Сводку пользователя блокируем первой: параллельные вставки одного пользователя
+        # встают в очередь на её строке, и пересчёт среднего ниже видит уже закоммиченные корзины
+        await self._track_balances(balances)
+        await self._bump_category_counters(counters)
+        await self._bump_withdrawal_stats(stats)
+        await self._refresh_avg_withdrawal(list(balances))
+
+    async def track_recategorized(
+            self,
+            changes: Iterable[tuple[UUID, Optional[str], Optional[str], Optional[datetime], Decimal]],
+    ):
+        # changes: (user_id, старая категория, новая категория, entry_date, withdraw)
+        counters = Counter()
+        stats = defaultdict(lambda: [Decimal(), 0])
+        for user_id, old_category, new_category, entry_date, withdraw in changes:
+            old_category, new_category = old_category or UNCATEGORIZED, new_category or UNCATEGORIZED
+            if old_category == new_category:
+                continue
+
+            counters[(user_id, old_category)] -= 1
+            counters[(user_id, new_category)] += 1
+            if entry_date is not None:
+                stats[(user_id, old_category, entry_date.date())][0] -= withdraw
+                stats[(user_id, old_category, entry_date.date())][1] -= 1
+                stats[(user_id, new_category, entry_date.date())][0] += withdraw
+                stats[(user_id, new_category, entry_date.date())][1] += 1
+
+        await self._bump_category_counters(counters)
+        await self._bump_withdrawal_stats(stats)
+
+    async def get_category_counters(self, user_id: UUID) -> dict[Optional[str], int]:
+        res = await self.session.execute(
+            select(UserCategoryCounter.category, UserCategoryCounter.transactions_count)
+            .where(UserCategoryCounter.user_id == user_id, UserCategoryCounter.transactions_count > 0)
+        )
+        return {(category or None): count for category, count in res.all()}
+
+    async def rebuild_category_counters(self, user_id: UUID) -> dict[Optional[str], int]:
+        # Пересчёт агрегата через GROUP BY, если счётчики пользователя потерялись или разошлись
+        category = func.coalesce(Transaction.category, UNCATEGORIZED)
+        await self.session.execute(
+            delete(UserCategoryCounter).where(UserCategoryCounter.user_id == user_id)
+        )
+        await self.session.execute(
+            insert(UserCategoryCounter).from_select(
+                ['user_id', 'category', 'transactions_count'],
+                select(Transaction.user_id, category, func.count())
+                .where(Transaction.user_id == user_id)
+                .group_by(Transaction.user_id, category),
+            )
+        )
+        return await self.get_category_counters(user_id)
+
+    async def has_balance_summary(self, user_id: UUID) -> bool:
+        # Сводка заводится вместе с первой транзакцией пользователя и заполнена миграцией
+        # для старых - по ней видно, что у пользователя есть транзакции, без скана transactions
+        summary = select(UserBalanceSummary.user_id).where(UserBalanceSummary.user_id == user_id)
+        res = await self.session.execute(select(summary.exists()))
+        return res.scalar()
+
+    async def get_avg_withdrawal(self, user_id: UUID, category: str, months: int) -> Optional[Decimal]:
+        # Среднее списание за последние months месяцев по дневным корзинам:
+        # читается не больше сотни строк первичного ключа вместо скана transactions
+        since = cast(func.now() - func.make_interval(0, months), Date)
+        res = await self.session.execute(
+            select(
+                func.sum(WithdrawalDailyStats.withdraw_sum)
+                / func.nullif(func.sum(WithdrawalDailyStats.transactions_count), 0)
+            )
+            .where(
+                WithdrawalDailyStats.user_id == user_id,
+                WithdrawalDailyStats.category == category,
+                WithdrawalDailyStats.day.between(since, func.current_date()),
+            )
+        )
+        return res.scalar()
+
+    async def get_balance_summary(
+            self,
+            user_id: UUID,
+    ) -> Optional[tuple[Optional[Decimal], Optional[Decimal]]]:
+        # (баланс, среднее списание за SAFETY_CUSHION_MONTHS) одной строкой первичного ключа
+        res = await self.session.execute(
+            select(
+                UserBalanceSummary.balance,
+                UserBalanceSummary.avg_withdrawal,
+                UserBalanceSummary.avg_computed_on == func.current_date(),
+            )
+            .where(UserBalanceSummary.user_id == user_id)
+        )
+        row = res.first()
+        if row is None:
+            return None
+
+        balance, avg_withdrawal, is_fresh = row
+        if not is_fresh:
+            # Окно сдвинулось с прошлого пересчёта - пересчитываем раз в сутки на пользователя.
+            # Пустой результат - строку уже пересчитал параллельный запрос или вставка
+            refreshed = await self._refresh_avg_withdrawal([user_id], only_stale=True)
+            if user_id in refreshed:
+                avg_withdrawal = refreshed[user_id]
+            else:
+                avg_withdrawal = (await self.session.execute(
+                    select(UserBalanceSummary.avg_withdrawal)
+                    .where(UserBalanceSummary.user_id == user_id)
+                )).scalar()
+        return balance, avg_withdrawal
+
+    async def _track_balances(self, balances: dict[UUID, tuple[datetime, Optional[Decimal]]]):
+        # Баланс сводки меняется, только если новая транзакция не раньше той, из которой он взят
+        rows = [
+            {'user_id': user_id, 'balance': balance, 'balance_receipt_date': receipt_date}
+            for user_id, (receipt_date, balance) in balances.items()
+        ]
+        rows.sort(key=lambda row: str(row['user_id']))
+        for i in range(0, len(rows), UPSERT_CHUNK_SIZE):
+            stmt = pg_insert(UserBalanceSummary).values(rows[i:i + UPSERT_CHUNK_SIZE])
+            is_newer = or_(
+                UserBalanceSummary.balance_receipt_date.is_(None),
+                stmt.excluded.balance_receipt_date >= UserBalanceSummary.balance_receipt_date,
+            )
+            stmt = stmt.on_conflict_do_update(
+                index_elements=['user_id'],
+                set_={
+                    'balance': case(
+                        (is_newer, stmt.excluded.balance), else_=UserBalanceSummary.balance,
+                    ),
+                    'balance_receipt_date': case(
+                        (is_newer, stmt.excluded.balance_receipt_date),
+                        else_=UserBalanceSummary.balance_receipt_date,
+                    ),
+                },
+            )
+            await self.session.execute(stmt)
+
+    async def _refresh_avg_withdrawal(
+            self,
+            user_ids: list[UUID],
+            only_stale: bool = False,
+    ) -> dict[UUID, Optional[Decimal]]:
+        # Среднее в сводке считается по дневным корзинам '*', как в get_avg_withdrawal
+        if not user_ids:
+            return {}
+        since = cast(func.now() - func.make_interval(0, SAFETY_CUSHION_MONTHS), Date)
+        avg_withdrawal = (
+            select(
+                func.sum(WithdrawalDailyStats.withdraw_sum)
+                / func.nullif(func.sum(WithdrawalDailyStats.transactions_count), 0)
+            )
+            .where(
+                WithdrawalDailyStats.user_id == UserBalanceSummary.user_id,
+                WithdrawalDailyStats.category == ALL_CATEGORIES,
+                WithdrawalDailyStats.day.between(since, func.current_date()),
+            )
+            .scalar_subquery()
+        )
+        stmt = update(UserBalanceSummary).where(UserBalanceSummary.user_id.in_(user_ids))
+        if only_stale:
+            # Условие перепроверяется после ожидания блокировки: строку, которую за это время
+            # пересчитала вставка, не перезаписываем значением по более старому снимку
+            stmt = stmt.where(UserBalanceSummary.avg_computed_on.is_distinct_from(func.current_date()))
+        res = await self.session.execute(
+            stmt
+            .values(avg_withdrawal=avg_withdrawal, avg_computed_on=func.current_date())
+            .returning(UserBalanceSummary.user_id, UserBalanceSummary.avg_withdrawal)
+            .execution_options(synchronize_session=False)
+        )
+        return dict(res.all())
+
+    async def _bump_category_counters(self, deltas: Counter):
+        rows = [
+            {'user_id': user_id, 'category': category, 'transactions_count': delta}
+            for (user_id, category), delta in deltas.items()
+            if delta
+        ]
+        await self._upsert_increments(
+            UserCategoryCounter,
+            keys=('user_id', 'category'),
+            increments=('transactions_count',),
+            rows=rows,
+        )
+
+    async def _bump_withdrawal_stats(self, deltas: dict[tuple[UUID, str, date], list]):
+        rows = [
+            {
+                'user_id': user_id,
+                'category': category,
+                'day': day,
+                'withdraw_sum': withdraw_sum,
+                'transactions_count': count,
+            }
+            for (user_id, category, day), (withdraw_sum, count) in deltas.items()
+            if count or withdraw_sum
+        ]
+        await self._upsert_increments(
+            WithdrawalDailyStats,
+            keys=('user_id', 'category', 'day'),
+            increments=('withdraw_sum', 'transactions_count'),
+            rows=rows,
+        )
+
+    async def _upsert_increments(
+            self,
+            model,
+            keys: tuple[str, ...],
+            increments: tuple[str, ...],
+            rows: list[dict],
+    ):
+        # Многострочный INSERT ... ON CONFLICT DO UPDATE, прибавляющий increments к существующим строкам.
+        # Строки сортируем по ключу, чтобы параллельные транзакции брали блокировки в одном порядке
+        rows.sort(key=lambda row: tuple(str(row[key]) for key in keys))
+        for i in range(0, len(rows), UPSERT_CHUNK_SIZE):
+            stmt = pg_insert(model).values(rows[i:i + UPSERT_CHUNK_SIZE])
+            stmt = stmt.on_conflict_do_update(
+                index_elements=list(keys),
+                set_={column: getattr(model, column) + stmt.excluded[column] for column in increments},
+            )
+            await self.session.execute(stmt)
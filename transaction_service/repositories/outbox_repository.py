@@ -0,0 +1,90 @@
+from collections.abc import Sequence
+from uuid import UUID
+
+from sqlalchemy import delete, exists, func, insert, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from transaction_service.models.outbox import AnalysisOutbox
+from transaction_service.models.transaction import Transaction
+
+
+class OutboxRepository:
+    # analysis_outbox пишется в той же сессии (и транзакции), что и transactions,
+    # поэтому коммит - забота вызывающего
+    def __init__(self, session: AsyncSession):
+        self.session = session
+
+    async def add(self, transaction_id: UUID) -> None:
+        await self.session.execute(insert(AnalysisOutbox).values(transaction_id=transaction_id))
+
+    async def add_many(self, transaction_ids: Sequence[UUID]) -> None:
+        if not transaction_ids:
+            return
+        connection = await self.session.connection()
+        raw_connection = await connection.get_raw_connection()
+        await raw_connection.driver_connection.copy_records_to_table(
+            AnalysisOutbox.__tablename__,
+            records=[(transaction_id,) for transaction_id in transaction_ids],
+            columns=['transaction_id'],
+        )
+
+    async def complete(self, transaction_ids: Sequence[UUID]) -> None:
+        await self.session.execute(
+            delete(AnalysisOutbox)
+            .where(AnalysisOutbox.transaction_id.in_(transaction_ids))
+            .execution_options(synchronize_session=False)
+        )
+
+    async def claim(self, limit: int, publish_delay: float) -> list[tuple[int, UUID, int]]:
+        # Строки, которые никто не опубликовал за publish_delay секунд или чей retry_at настал.
+        # SKIP LOCKED: несколько релеев разбирают outbox параллельно, не дожидаясь друг друга
+        res = await self.session.execute(
+            select(AnalysisOutbox.id, AnalysisOutbox.transaction_id, AnalysisOutbox.attempts)
+            .where(
+                AnalysisOutbox.created_at <= func.now() - _seconds(publish_delay),
+                (AnalysisOutbox.retry_at.is_(None)) | (AnalysisOutbox.retry_at <= func.now()),
+            )
+            .order_by(AnalysisOutbox.id)
+            .limit(limit)
+            .with_for_update(skip_locked=True)
+        )
+        return [tuple(row) for row in res.all()]
+
+    async def mark_published(self, ids: Sequence[int], retry_delay: float) -> None:
+        # Строка остаётся до сохранения результата: если сообщение потеряется, через retry_delay
+        # релей отправит его снова
+        await self.session.execute(
+            update(AnalysisOutbox)
+            .where(AnalysisOutbox.id.in_(ids))
+            .values(
+                attempts=AnalysisOutbox.attempts + 1,
+                retry_at=func.now() + _seconds(retry_delay),
+            )
+            .execution_options(synchronize_session=False)
+        )
+
+    async def enqueue_stuck(self, stuck_after: float, limit: int) -> int:
+        # in_progress строки старше stuck_after без задачи в outbox (например, записанные
+        # до его появления) ставятся в outbox заново. Выборка идёт по частичному индексу
+        # ix_transactions_in_progress_created_at
+        stuck = (
+            select(Transaction.id)
+            .where(
+                Transaction.processing_status == 'in_progress',
+                Transaction.created_at <= func.now() - _seconds(stuck_after),
+                ~exists().where(AnalysisOutbox.transaction_id == Transaction.id),
+            )
+            .order_by(Transaction.created_at)
+            .limit(limit)
+            .with_for_update(of=Transaction, skip_locked=True)
+        )
+        res = await self.session.execute(
+            insert(AnalysisOutbox)
+            .from_select(['transaction_id'], stuck)
+            .returning(AnalysisOutbox.id)
+        )
+        return len(res.all())
+
+
+def _seconds(value: float):
+    return func.make_interval(0, 0, 0, 0, 0, 0, float(value))
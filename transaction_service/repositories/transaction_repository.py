@@ -1,109 +1,249 @@
+from collections.abc import AsyncIterator, Sequence
 from datetime import datetime
+from decimal import Decimal
 from typing import Optional
 from uuid import UUID
 
+from sqlalchemy.engine import Row
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, func, text, delete, desc
+from sqlalchemy import (
+    INTEGER,
+    UUID as SA_UUID,
+    String,
+    column,
+    delete,
+    func,
+    insert,
+    inspect,
+    select,
+    text,
+    tuple_,
+    update,
+    values,
+)
 
 from transaction_service.models.transaction import Transaction, EditedTransaction
+from transaction_service.repositories.aggregates_repository import AggregatesRepository
+from transaction_service.repositories.outbox_repository import OutboxRepository
 from transaction_service.schemas.transaction import TransactionCreate
 
 
+def _lock_categories(transaction_ids: Sequence[UUID]):
+    # CTE SELECT ... FOR UPDATE со старыми категориями для UPDATE ... RETURNING.
+    # Простое самообъединение читает old из снимка запроса: в READ COMMITTED при гонке с PATCH
+    # перепроверяется только обновляемая строка, и счётчики уменьшались бы у устаревшей категории.
+    # FOR UPDATE дожидается конкурента и отдаёт последнюю версию строки; порядок по id -
+    # чтобы пачки, пересекающиеся по строкам, не ловили deadlock
+    table = Transaction.__table__
+    return (
+        select(table.c.id, table.c.category)
+        .where(table.c.id.in_(transaction_ids))
+        .order_by(table.c.id)
+        .with_for_update()
+        .cte('old')
+    )
+
+
 class TransactionRepository:
     def __init__(self, session: AsyncSession):
         self.session = session
+        self.aggregates = AggregatesRepository(session)
+        self.outbox = OutboxRepository(session)
 
-    async def create(self, transaction: TransactionCreate) -> Transaction:
-        db_transaction = Transaction(**transaction.model_dump())
-        self.session.add(db_transaction)
+    async def create(self, transaction: TransactionCreate) -> Row:
+        # INSERT ... RETURNING отдаёт строку с умолчаниями колонок сразу, refresh после коммита не нужен
+        table = Transaction.__table__
+        res = await self.session.execute(
+            insert(table).values(**transaction.model_dump()).returning(*table.columns)
+        )
+        row = res.one()
+        await self.outbox.add(row.id)
+        await self.aggregates.track_inserted([(
+            row.user_id,
+            row.category,
+            row.entry_date,
+            row.withdraw,
+            row.receipt_date,
+            row.balance,
+        )])
+        await self.session.commit()
+        return row
+
+    async def create_many(self, transactions: Sequence[TransactionCreate]) -> list[Row]:
+        # Один многострочный INSERT ... RETURNING вместо INSERT + refresh на каждую строку.
+        # id, created_at и processing_status заполняют Python-умолчания колонок,
+        # строки результата идут в порядке transactions
+        table = Transaction.__table__
+        res = await self.session.execute(
+            insert(table).returning(*table.columns, sort_by_parameter_order=True),
+            [ts.model_dump() for ts in transactions],
+        )
+        rows = res.all()
+        await self.outbox.add_many([row.id for row in rows])
+        await self.aggregates.track_inserted(
+            (row.user_id, row.category, row.entry_date, row.withdraw, row.receipt_date, row.balance)
+            for row in rows
+        )
         await self.session.commit()
-        await self.session.refresh(db_transaction)
-        return db_transaction
+        return rows
 
     async def save(self, transaction: Transaction):
+        state = inspect(transaction)
+        if state.persistent:
+            history = state.attrs.category.history
+            if history.has_changes():
+                old_category = history.deleted[0] if history.deleted else None
+                await self.aggregates.track_recategorized([(
+                    transaction.user_id,
+                    old_category,
+                    transaction.category,
+                    transaction.entry_date,
+                    transaction.withdraw,
+                )])
         self.session.add(transaction)
         await self.session.commit()
 
-    async def create_account_stmt(self, transactions: list):
-        for ts in transactions:
-            self.session.add(Transaction(**ts))
+    async def commit(self):
         await self.session.commit()
 
-    async def get(self, transaction_id: UUID) -> Optional[Transaction]:
-        result = await self.session.execute(
-            select(Transaction).filter(Transaction.id == transaction_id)
+    async def create_account_stmt(self, transactions: list[dict], commit: bool = True):
+        # Выписка пишется одним COPY через asyncpg в рамках транзакции сессии,
+        # в словарях должны быть все колонки таблицы
+        if not transactions:
+            return
+
+        columns = [c.name for c in Transaction.__table__.columns]
+        connection = await self.session.connection()
+        raw_connection = await connection.get_raw_connection()
+        await raw_connection.driver_connection.copy_records_to_table(
+            Transaction.__tablename__,
+            records=[tuple(ts[c] for c in columns) for ts in transactions],
+            columns=columns,
         )
+        await self.outbox.add_many([ts['id'] for ts in transactions])
+        await self.aggregates.track_inserted(
+            (
+                ts['user_id'], ts['category'], ts['entry_date'],
+                ts['withdraw'], ts['receipt_date'], ts['balance'],
+            )
+            for ts in transactions
+        )
+        if commit:
+            await self.session.commit()
+
+    async def get(self, transaction_id: UUID, for_update: bool = False) -> Optional[Transaction]:
+        stmt = select(Transaction).filter(Transaction.id == transaction_id)
+        if for_update:
+            # Под блокировкой перечитываем строку, даже если она уже есть в сессии
+            stmt = stmt.with_for_update().execution_options(populate_existing=True)
+        result = await self.session.execute(stmt)
         return result.scalars().first()
 
+    async def get_many(self, transaction_ids: Sequence[UUID]) -> list[Transaction]:
+        result = await self.session.execute(
+            select(Transaction).filter(Transaction.id.in_(transaction_ids))
+        )
+        return list(result.scalars().all())
+
     async def get_all(
             self,
             user_id: UUID,
+            columns: Sequence[str],
             start_date: Optional[datetime] = None,
             end_date: Optional[datetime] = None,
             skip: int = 0,
             limit: int = 10,
-    ) -> tuple[list[Transaction], int]:
-        base_query = select(Transaction).filter(Transaction.user_id == user_id)
+            after: Optional[tuple[datetime, UUID]] = None,
+            include_total: bool = True,
+    ) -> tuple[list[Row], Optional[int]]:
+        # Страница - кортежи columns без ORM-объектов.
+        # receipt_date и id нужны для курсора и должны быть среди columns
+        base_query = select(Transaction.id).filter(Transaction.user_id == user_id)
 
         if start_date:
             base_query = base_query.filter(Transaction.receipt_date >= start_date)
         if end_date:
             base_query = base_query.filter(Transaction.receipt_date <= end_date)
 
-        data_query = base_query.order_by(Transaction.receipt_date.desc()).offset(skip).limit(limit)
+        # after - курсор (receipt_date, id) последней строки предыдущей страницы
+        data_query = base_query.with_only_columns(*(Transaction.__table__.c[name] for name in columns))
+        if after:
+            data_query = data_query.filter(
+                tuple_(Transaction.receipt_date, Transaction.id) < tuple_(*after)
+            )
+        data_query = (
+            data_query
+            .order_by(Transaction.receipt_date.desc(), Transaction.id.desc())
+            .offset(skip)
+            .limit(limit)
+        )
         data_result = await self.session.execute(data_query)
-        transactions = list(data_result.scalars().all())
+        transactions = list(data_result.all())
 
-        count_query = select(func.count()).select_from(base_query.subquery())
-        count_result = await self.session.execute(count_query)
-        total = count_result.scalar()
+        total = None
+        if include_total:
+            count_query = select(func.count()).select_from(base_query.subquery())
+            count_result = await self.session.execute(count_query)
+            total = count_result.scalar()
 
         return transactions, total
 
+    async def iter_all(
+            self,
+            user_id: UUID,
+            columns: Sequence[str],
+            start_date: Optional[datetime] = None,
+            end_date: Optional[datetime] = None,
+            batch_size: int = 1000,
+    ) -> AsyncIterator[Sequence[tuple]]:
+        # Вся история пользователя порциями кортежей columns через серверный курсор:
+        # в памяти не больше batch_size строк, ORM-объекты и identity map не создаются
+        query = (
+            select(*(Transaction.__table__.c[name] for name in columns))
+            .where(Transaction.user_id == user_id)
+            .order_by(Transaction.receipt_date.desc(), Transaction.id.desc())
+            .execution_options(yield_per=batch_size)
+        )
+        if start_date:
+            query = query.where(Transaction.receipt_date >= start_date)
+        if end_date:
+            query = query.where(Transaction.receipt_date <= end_date)
+
+        result = await self.session.stream(query)
+        async for rows in result.partitions():
+            yield rows
+
     async def get_all_edited(self):
         stmt = select(EditedTransaction)
         res = await self.session.execute(stmt)
         return res.scalars().all()
 
-    async def drop_edited(self):
-        stmt = delete(EditedTransaction)
-        await self.session.execute(stmt)
-        await self.session.commit()
+    async def drop_edited(self, keys: Sequence[tuple[UUID, datetime]], commit: bool = True):
+        # Удаляем только правки, попавшие в обучение, по (id, created_at): правки, записанные
+        # во время обучения, остаются для следующего окна
+        if keys:
+            stmt = delete(EditedTransaction).where(
+                tuple_(EditedTransaction.id, EditedTransaction.created_at).in_(keys)
+            )
+            await self.session.execute(stmt)
+        if commit:
+            await self.session.commit()
 
     async def add_edited(self, transaction: EditedTransaction):
         self.session.add(transaction)
         await self.session.commit()
 
     async def get_avg_withdrawal_by_category(self, user_id: UUID, category: str):
-        res = await self.session.execute(text(
-            """
-            select avg(withdraw) from transactions
-            where user_id = :user_id and
-            category = :cat and 
-            entry_date between (now() - interval '1 month') and now()
-            """),
-            {'user_id': user_id, 'cat': category}
-        )
-        result = res.fetchone()
-        return result[0] if result else None
+        return await self.aggregates.get_avg_withdrawal(user_id, category, months=1)
 
-    async def get_avg_withdrawal_by_user(self, user_id: UUID):
-        res = await self.session.execute(text(
-            """
-            select avg(withdraw) from transactions
-            where user_id = :user_id and
-            entry_date between (now() - interval '3 month') and now()
-            """),
-            {'user_id': user_id}
-        )
-        result = res.fetchone()
-        return result[0] if result else None
-
-    async def get_user_current_balance(self, user_id: UUID):
-        res = await self.session.execute(select(Transaction).where(Transaction.user_id == user_id).order_by(desc(Transaction.receipt_date)).limit(1))
-        last_ts = res.scalar_one_or_none()
-        if last_ts:
-            return last_ts.balance
+    async def get_balance_summary(
+            self,
+            user_id: UUID,
+    ) -> Optional[tuple[Optional[Decimal], Optional[Decimal]]]:
+        summary = await self.aggregates.get_balance_summary(user_id)
+        # Чтение могло пересчитать устаревшее среднее
+        await self.session.commit()
+        return summary
 
     async def get_oldest_ts(self, user_id: UUID):
         res = await self.session.execute(text(
@@ -115,16 +255,44 @@ class TransactionRepository:
         return res.fetchone()
 
 
-    async def update_status(
-        self, transaction_id: UUID, status: str
-    ) -> Optional[Transaction]:
-        transaction = await self.get(transaction_id)
-        if not transaction:
+    async def update_status(self, transaction_id: UUID, status: str) -> Optional[Row]:
+        # Один UPDATE ... RETURNING вместо SELECT, UPDATE и refresh
+        table = Transaction.__table__
+        res = await self.session.execute(
+            update(table)
+            .where(table.c.id == transaction_id)
+            .values(processing_status=status)
+            .returning(*table.columns)
+        )
+        row = res.one_or_none()
+        if row is None:
             return None
-        transaction.processing_status = status
+        if status != 'in_progress':
+            await self.outbox.complete([transaction_id])
         await self.session.commit()
-        await self.session.refresh(transaction)
-        return transaction
+        return row
+
+    async def update_status_many(
+            self,
+            transaction_ids: Sequence[UUID],
+            status: str,
+            commit: bool = True,
+            from_status: Optional[str] = None,
+    ) -> None:
+        # from_status - менять только строки в этом статусе, остальные уже обработаны
+        stmt = (
+            update(Transaction)
+            .where(Transaction.id.in_(transaction_ids))
+            .values(processing_status=status)
+            .execution_options(synchronize_session=False)
+        )
+        if from_status is not None:
+            stmt = stmt.where(Transaction.processing_status == from_status)
+        await self.session.execute(stmt)
+        if status != 'in_progress':
+            await self.outbox.complete(transaction_ids)
+        if commit:
+            await self.session.commit()
 
     async def update_analysis(
         self,
@@ -132,13 +300,79 @@ class TransactionRepository:
         category: str,
         expediency: int,
         status: str
-    ) -> Optional[Transaction]:
-        transaction = await self.get(transaction_id)
-        if not transaction:
+    ) -> Optional[Row]:
+        # Как update_analysis_many для одной строки: old отдаёт заблокированную категорию
+        # до обновления для счётчиков, отдельный SELECT не нужен
+        table = Transaction.__table__
+        old = _lock_categories([transaction_id])
+        res = await self.session.execute(
+            update(table)
+            .where(table.c.id == transaction_id, old.c.id == table.c.id)
+            .values(category=category, expediency=expediency, processing_status=status)
+            .returning(old.c.category.label('old_category'), *table.columns)
+        )
+        row = res.one_or_none()
+        if row is None:
             return None
-        transaction.category = category
-        transaction.expediency = expediency
-        transaction.processing_status = status
+        await self.aggregates.track_recategorized([(
+            row.user_id,
+            row.old_category,
+            row.category,
+            row.entry_date,
+            row.withdraw,
+        )])
+        await self.outbox.complete([transaction_id])
         await self.session.commit()
-        await self.session.refresh(transaction)
-        return transaction
+        return row
+
+    async def update_analysis_many(self, results: Sequence[dict]) -> None:
+        # Один UPDATE ... FROM (VALUES ...) на всю пачку результатов анализа,
+        # элементы results - словари с ключами id, category, expediency, processing_status
+        if not results:
+            return
+
+        analysis = values(
+            column('id', SA_UUID),
+            column('category', String),
+            column('expediency', INTEGER),
+            column('processing_status', String),
+            name='analysis',
+        ).data([
+            (r['id'], r['category'], r['expediency'], r['processing_status'])
+            for r in results
+        ])
+        # old отдаёт заблокированную категорию до обновления - она нужна счётчикам
+        transactions = Transaction.__table__
+        old = _lock_categories([r['id'] for r in results])
+        stmt = (
+            update(transactions)
+            .where(transactions.c.id == analysis.c.id, old.c.id == transactions.c.id)
+            .values(
+                category=analysis.c.category,
+                expediency=analysis.c.expediency,
+                processing_status=analysis.c.processing_status,
+            )
+            .returning(
+                transactions.c.user_id,
+                old.c.category,
+                transactions.c.category,
+                transactions.c.entry_date,
+                transactions.c.withdraw,
+            )
+        )
+        changes = (await self.session.execute(stmt)).all()
+        await self.aggregates.track_recategorized(changes)
+        # Результат сохранён - задачи в outbox больше не нужны, в том же коммите
+        await self.outbox.complete([r['id'] for r in results])
+        await self.session.commit()
+
+    async def get_category_counters(self, user_id: UUID) -> dict[Optional[str], int]:
+        return await self.aggregates.get_category_counters(user_id)
+
+    async def rebuild_category_counters(self, user_id: UUID) -> dict[Optional[str], int]:
+        counters = await self.aggregates.rebuild_category_counters(user_id)
+        await self.session.commit()
+        return counters
+
+    async def has_tracked_transactions(self, user_id: UUID) -> bool:
+        return await self.aggregates.has_balance_summary(user_id)
@@ -1,5 +1,6 @@
 from datetime import datetime
 from decimal import Decimal
+from typing import Any
 
 from pydantic import UUID4, BaseModel, ConfigDict
 
@@ -29,8 +30,25 @@ class TransactionResponse(BaseModel):
     expediency: int | None
 
 
+# Поля ответа в порядке схемы: списки читаются из базы кортежами этих колонок
+# и кодируются в JSON без построения моделей
+TRANSACTION_RESPONSE_FIELDS = tuple(TransactionResponse.model_fields)
+
+
 class ManyTransactionsResponse(BaseModel):
     model_config = ConfigDict(from_attributes=True)
 
-    total: int
+    total: int | None
     results: list[TransactionResponse]
+    next_cursor: str | None = None
+
+
+class BatchItemError(BaseModel):
+    # index - позиция элемента во входном массиве, errors - ошибки валидации в формате pydantic
+    index: int
+    errors: list[dict[str, Any]]
+
+
+class BatchCreateResponse(BaseModel):
+    created: list[TransactionResponse]
+    errors: list[BatchItemError]
@@ -1,5 +1,20 @@
+from collections.abc import Sequence
+from datetime import datetime
+from decimal import Decimal
+from typing import Optional
+
 import pandas as pd
 import numpy as np
+from catboost import CatBoostClassifier, CatBoostError, Pool
+
+# Строка для прогрева модели перед тем, как она начнёт обслуживать задачи
+WARM_UP_SAMPLE = {
+    'entry_dates': [datetime(2025, 1, 1)],
+    'receipt_dates': [datetime(2025, 1, 1)],
+    'balances': [Decimal('1000')],
+    'withdrawals': [Decimal('100')],
+    'deposits': [Decimal('0')],
+}
 
 def normalize_date(date: str):
     date = date.split('/')
@@ -36,28 +51,100 @@ def data_normalization(data):
     return data
 
 
-def predict(model, data) -> str:
+def build_features(
+        entry_dates: Sequence[Optional[datetime]],
+        receipt_dates: Sequence[Optional[datetime]],
+        balances: Sequence[Optional[Decimal]],
+        withdrawals: Sequence[Decimal],
+        deposits: Sequence[Decimal],
+        categories: Optional[Sequence[Optional[str]]] = None,
+) -> pd.DataFrame:
+    # Те же признаки, что data_normalization, но прямо из datetime/Decimal транзакций:
+    # без strftime на строку и обратного разбора строк через normalize_date и pd.to_datetime.
+    # Date.1 остаётся категориальным признаком-строкой d/m/Y - на таких строках учили модель
+    columns = {
+        'Date': pd.to_datetime(pd.Series(entry_dates, dtype=object)),
+        'Date.1': pd.to_datetime(pd.Series(receipt_dates, dtype=object)),
+        'Balance': pd.Series(balances, dtype=object),
+    }
+    if categories is not None:
+        columns['Category'] = pd.Series(categories)
+    columns['Withdrawal'] = pd.Series(withdrawals, dtype=object)
+    columns['Deposit'] = pd.Series(deposits, dtype=object)
+
+    data = pd.DataFrame(columns).dropna()
+    # Время в признаки не идёт: прежний путь терял его на strftime('%d/%m/%Y')
+    data = data.set_index(pd.DatetimeIndex(data.pop('Date'), name='Date').normalize())
+    data['Date.1'] = data['Date.1'].dt.strftime('%d/%m/%Y')
 
-    # INPUT
+    data['day'] = data.index.day
+    data['month'] = data.index.month
+    data['weekofyear'] = data.index.isocalendar().week
+    data['is_weekend'] = data.index.dayofweek >= 5
+
+    transaction = data.pop('Deposit') - data.pop('Withdrawal')
+    data['Transaction'] = transaction
+    data['is_deposit'] = transaction > 0
+    data['Transaction'] = transaction.abs()
+
+    return data
+
+
+def predict(model, data) -> str:
     # Date   Date.1   Balance  Withraw   Deposit.
     # d/m/Y  d/m/Y
+    return predict_many(model, data_normalization(data))[0]
 
-    # OUTPUT
-    # [{'shoping': 0.999, 'food': 0.1, ... }, ... ]
-
-    data = data_normalization(data)
 
-    probabilities = model.predict_proba(data)
-    indices = np.argmax(probabilities, axis=1)
-    answer = model.classes_[indices]
+def predict_many(model, features: pd.DataFrame, thread_count: int = -1) -> list[str]:
 
-    # answer = model.predict_proba(data)
-    return answer[0]
+    # INPUT
+    # признаки из build_features (или data_normalization)
 
+    # OUTPUT
+    # ['Shopping', 'Food', ...] - one category per input row
 
-def fit_model(model, data):
-    # Date   Date.1   Balance  Withraw   Deposit   Category.
-    # d/m/Y  d/m/Y
-    data = data_normalization(data).reset_index().drop('Date', axis=1)
-    model.fit(data.drop('Category', axis=1), data['Category'], cat_features=('Date.1', 'is_weekend', 'is_deposit'))
-    model.save_model('fitted_model.cbm')
\ No newline at end of file
+    probabilities = model.predict_proba(features, thread_count=thread_count)
+    indices = np.argmax(probabilities, axis=1)
+    return list(model.classes_[indices])
+
+
+def warm_up(model) -> None:
+    # В одном потоке: модель прогревается и в главном процессе celery до fork,
+    # а потоки пула catboost в дочерние процессы не переходят
+    predict_many(model, build_features(**WARM_UP_SAMPLE), thread_count=1)
+
+
+def fit_model(model, data: pd.DataFrame, iterations: int, learning_rate: float):
+    # признаки из build_features с колонкой Category
+    # Дообучаем новую модель поверх текущей (init_model), а не учим с нуля на одних правках;
+    # исходная модель в это время продолжает обслуживать предсказания.
+    # Правок немного, поэтому добавляем iterations деревьев с маленьким шагом, а не ещё
+    # полный круг обучения. CatBoostError (например, категория, которой модель не знает)
+    # уходит вызывающему: частичную модель вместо текущей не публикуем
+    data = data.reset_index().drop('Date', axis=1)
+    features, labels = data.drop('Category', axis=1), data['Category']
+    if labels.empty:
+        raise CatBoostError('No edits with complete features to fit on')
+    weights = [1.0] * len(labels)
+
+    # Продолжить обучение можно только с тем же набором классов, а CatBoost берёт его из меток.
+    # Обычно правки покрывают не все категории - недостающие добавляем строками с нулевым весом
+    class_names = list(model.classes_)
+    missing = [name for name in class_names if name not in set(labels)]
+    if missing:
+        features = pd.concat([features, features.iloc[[0] * len(missing)]], ignore_index=True)
+        labels = pd.concat([labels, pd.Series(missing)], ignore_index=True)
+        weights += [0.0] * len(missing)
+
+    fitted = CatBoostClassifier(**{
+        **model.get_params(),
+        'iterations': iterations,
+        'learning_rate': learning_rate,
+        'class_names': class_names,
+        'verbose': False,
+        'allow_writing_files': False,
+    })
+    pool = Pool(features, labels, cat_features=['Date.1', 'is_weekend', 'is_deposit'], weight=weights)
+    fitted.fit(pool, init_model=model)
+    return fitted
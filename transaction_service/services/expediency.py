@@ -0,0 +1,18 @@
+from decimal import Decimal
+from typing import Optional
+
+
+def expediency_score(category: str, withdraw: Decimal, avg_withdraw: Optional[Decimal]) -> int:
+    # 0 - не оцениваем (зарплата или нет истории по категории),
+    # 1..5 - насколько трата выбивается из среднего по категории за месяц
+    if category == 'Salary' or not avg_withdraw:
+        return 0
+
+    coef = (withdraw - avg_withdraw) / avg_withdraw
+    if coef > 20:
+        return 5
+    if coef > 10:
+        return 3
+    if coef > 5:
+        return 2
+    return 1
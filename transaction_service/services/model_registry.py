@@ -0,0 +1,51 @@
+import os
+import tempfile
+from datetime import datetime
+
+# Версия модели, поставляемой вместе с сервисом (model.cbm), пока ничего не переобучено
+BASE_VERSION = 'base'
+
+
+class ModelRegistry:
+    # Каталог с версиями модели: model-<version>.cbm и файл ACTIVE с активной версией.
+    # Файлы пишутся во временный файл и подменяются через os.replace, так что читатель
+    # всегда видит либо старую, либо новую версию целиком
+    def __init__(self, path: str, base_model_path: str = 'model.cbm'):
+        self.path = path
+        self.base_model_path = base_model_path
+
+    def active_version(self) -> str:
+        try:
+            with open(os.path.join(self.path, 'ACTIVE')) as f:
+                return f.read().strip() or BASE_VERSION
+        except FileNotFoundError:
+            return BASE_VERSION
+
+    def artifact_path(self, version: str) -> str:
+        if version == BASE_VERSION:
+            return self.base_model_path
+        return os.path.join(self.path, f'model-{version}.cbm')
+
+    def load(self, version: str):
+        from catboost import CatBoostClassifier
+
+        return CatBoostClassifier().load_model(self.artifact_path(version))
+
+    def publish(self, model) -> str:
+        os.makedirs(self.path, exist_ok=True)
+        version = datetime.now().strftime('%Y%m%d%H%M%S%f')
+
+        tmp_path = self._tmp_path()
+        model.save_model(tmp_path)
+        os.replace(tmp_path, self.artifact_path(version))
+
+        tmp_path = self._tmp_path()
+        with open(tmp_path, 'w') as f:
+            f.write(version)
+        os.replace(tmp_path, os.path.join(self.path, 'ACTIVE'))
+        return version
+
+    def _tmp_path(self) -> str:
+        fd, tmp_path = tempfile.mkstemp(dir=self.path, suffix='.tmp')
+        os.close(fd)
+        return tmp_path
@@ -0,0 +1,33 @@
+from redis.asyncio import Redis
+
+from transaction_service.services.transaction_service import TransactionAnalyzer
+from transaction_service.utils.metrics import RETRAIN_QUEUE_DEPTH
+
+
+class RetrainScheduler:
+    # Склеивает правки категорий в одно переобучение: первая правка в окне планирует
+    # обучение через window_seconds, а при max_edits правках обучение запускается сразу.
+    # Что одновременно идёт не больше одного обучения, следит сам воркер
+    PENDING_KEY = 'retrain:pending_edits'
+    SCHEDULED_KEY = 'retrain:scheduled'
+
+    def __init__(self, redis: Redis, analyzer: TransactionAnalyzer, window_seconds: int, max_edits: int):
+        self._redis = redis
+        self._analyzer = analyzer
+        self._window_seconds = window_seconds
+        self._max_edits = max_edits
+
+    async def record_edit(self) -> None:
+        async with self._redis.pipeline(transaction=True) as pipe:
+            pipe.incr(self.PENDING_KEY)
+            pipe.expire(self.PENDING_KEY, self._window_seconds, nx=True)
+            pipe.set(self.SCHEDULED_KEY, 1, nx=True, ex=self._window_seconds)
+            pending, _, first_in_window = await pipe.execute()
+        RETRAIN_QUEUE_DEPTH.set(pending)
+
+        if pending >= self._max_edits:
+            await self._redis.delete(self.PENDING_KEY, self.SCHEDULED_KEY)
+            RETRAIN_QUEUE_DEPTH.set(0)
+            await self._analyzer.fit_model()
+        elif first_in_window:
+            await self._analyzer.fit_model(countdown=self._window_seconds)
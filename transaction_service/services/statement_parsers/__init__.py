@@ -0,0 +1,13 @@
+from .base import BankStatementParser, ParsedPage, StatementParseError
+from .pool import AccountStatementParser
+from .registry import PARSERS, UnsupportedBankError, get_parser
+
+__all__ = (
+    "AccountStatementParser",
+    "BankStatementParser",
+    "ParsedPage",
+    "PARSERS",
+    "StatementParseError",
+    "UnsupportedBankError",
+    "get_parser",
+)
@@ -0,0 +1,154 @@
+import uuid
+import re
+from collections.abc import Iterable, Iterator
+from dataclasses import dataclass
+from datetime import datetime
+from decimal import Decimal
+from io import BytesIO
+from typing import ClassVar
+from uuid import UUID
+
+import PyPDF2
+
+
+# Сколько текста с краёв страницы хранить для склейки записи, разорванной переносом страницы
+PAGE_EDGE_CHARS = 512
+
+
+class StatementParseError(ValueError):
+    pass
+
+
+@dataclass
+class ParsedPage:
+    balances: list[Decimal]
+    # (entry_date, receipt_date, withdraw, deposit)
+    entries: list[tuple[datetime, datetime, Decimal, Decimal]]
+    # Текст до первой и после последней найденной записи. Запись, разорванная переносом
+    # страницы, собирается из tail одной страницы и head следующей (StatementAccumulator)
+    head: str = ''
+    tail: str = ''
+
+
+class BankStatementParser:
+    # Парсер выписки одного банка. Наследники задают скомпилированные регулярки
+    # и разбор текста одной страницы, остальное (чтение pdf, баланс) общее
+    bank: ClassVar[str]
+
+    def parse_page_text(self, text: str) -> ParsedPage:
+        raise NotImplementedError
+
+    def parse_pages(self, pdf_content: bytes) -> list[ParsedPage]:
+        with BytesIO(pdf_content) as pdf_file:
+            pages = PyPDF2.PdfReader(pdf_file).pages
+            return [self.parse_page_text(page.extract_text()) for page in pages]
+
+    def iter_transactions(self, pdf_content: bytes, user_id: UUID) -> Iterator[dict]:
+        accumulator = StatementAccumulator(user_id, self)
+        with BytesIO(pdf_content) as pdf_file:
+            for page in PyPDF2.PdfReader(pdf_file).pages:
+                yield from accumulator.feed(self.parse_page_text(page.extract_text()))
+        accumulator.close()
+
+
+def page_edges(text: str, matches: Iterable[re.Match]) -> tuple[str, str]:
+    # (head, tail) страницы для ParsedPage по найденным на ней записям
+    spans = [match.span() for match in matches]
+    if not spans:
+        return text[-PAGE_EDGE_CHARS:], text[:PAGE_EDGE_CHARS]
+    first_start = min(start for start, _ in spans)
+    last_end = max(end for _, end in spans)
+    return text[:first_start][-PAGE_EDGE_CHARS:], text[last_end:][:PAGE_EDGE_CHARS]
+
+
+def split_pdf(pdf_content: bytes, pages_per_chunk: int) -> list[bytes]:
+    # Выписка режется на документы по pages_per_chunk страниц: процессу пула уходит
+    # только его кусок, а не весь файл на каждый кусок
+    with BytesIO(pdf_content) as pdf_file:
+        reader = PyPDF2.PdfReader(pdf_file)
+        pages_count = len(reader.pages)
+        if pages_count <= pages_per_chunk:
+            return [pdf_content]
+
+        chunks = []
+        for start in range(0, pages_count, pages_per_chunk):
+            writer = PyPDF2.PdfWriter()
+            for i in range(start, min(start + pages_per_chunk, pages_count)):
+                writer.add_page(reader.pages[i])
+            with BytesIO() as out:
+                writer.write(out)
+                chunks.append(out.getvalue())
+        return chunks
+
+
+def parse_amount(amount: str) -> Decimal:
+    return Decimal(amount.replace(' ', ''))
+
+
+def date_from_str(date_str: str) -> datetime:
+    date_str = date_str.strip()
+    updated_year = '20' + date_str.split('.')[-1]
+    date_str = '.'.join(date_str.split('.')[:2]) + '.' + updated_year
+    return datetime.strptime(date_str, '%d.%m.%Y')
+
+
+class StatementAccumulator:
+    # Превращает разобранные страницы в строки transactions, считая баланс нарастающим итогом.
+    # Страницы нужно подавать по порядку: баланс на начало периода - первый найденный в выписке.
+    # Страницы разбираются независимо (в разных процессах пула), поэтому запись, разорванную
+    # переносом страницы, ищем здесь: в склейке хвоста прошлой страницы и начала текущей
+    def __init__(self, user_id: UUID, parser: BankStatementParser):
+        self.user_id = user_id
+        self._parser = parser
+        self._balance: Decimal | None = None
+        self._pending: list[tuple[datetime, datetime, Decimal, Decimal]] = []
+        self._tail = ''
+
+    def feed(self, page: ParsedPage) -> list[dict]:
+        transactions = []
+        joined = None
+        if self._tail.strip() and page.head.strip():
+            joined = self._parser.parse_page_text(f'{self._tail}\n{page.head}')
+            transactions.extend(self._feed_records(joined))
+        # Страница без своих записей, чей текст уже дал запись в склейке, дальше не переносится
+        used_in_join = joined is not None and bool(joined.entries or joined.balances)
+        self._tail = '' if used_in_join and not (page.entries or page.balances) else page.tail
+        transactions.extend(self._feed_records(page))
+        return transactions
+
+    def _feed_records(self, page: ParsedPage) -> list[dict]:
+        if self._balance is None and page.balances:
+            self._balance = page.balances[0]
+
+        self._pending.extend(page.entries)
+        if self._balance is None:
+            return []
+
+        entries, self._pending = self._pending, []
+        return [self._build_transaction(*entry) for entry in entries]
+
+    def close(self) -> None:
+        if self._pending:
+            raise StatementParseError('Statement has no opening balance')
+
+    def _build_transaction(
+            self,
+            entry_date: datetime,
+            receipt_date: datetime,
+            withdraw: Decimal,
+            deposit: Decimal,
+    ) -> dict:
+        self._balance += deposit - withdraw
+        return {
+            'id': uuid.uuid4(),
+            'entry_date': entry_date,
+            'receipt_date': receipt_date,
+            'user_id': self.user_id,
+            'withdraw': withdraw,
+            'deposit': deposit,
+            'processing_status': 'in_progress',
+            'category': None,
+            'expediency': 0,
+            'balance': self._balance,
+            'created_at': datetime.now(),
+        }
@@ -0,0 +1,57 @@
+import asyncio
+from collections.abc import AsyncIterator
+from concurrent.futures import Executor
+from uuid import UUID
+
+from transaction_service.services.statement_parsers.base import (
+    ParsedPage,
+    StatementAccumulator,
+    split_pdf,
+)
+from transaction_service.services.statement_parsers.registry import get_parser
+
+
+def parse_pages(bank: str, pdf_content: bytes) -> list[ParsedPage]:
+    # Выполняется в процессе пула: парсер банка импортируется там при первом обращении
+    return get_parser(bank).parse_pages(pdf_content)
+
+
+class AccountStatementParser:
+    def __init__(self, executor: Executor, pages_per_chunk: int = 16):
+        self._executor = executor
+        self._pages_per_chunk = pages_per_chunk
+
+    async def iter_transactions(
+            self,
+            pdf_content: bytes,
+            user_id: UUID,
+            bank: str,
+    ) -> AsyncIterator[list[dict]]:
+        # Неизвестный банк отсекаем до того, как грузить пул
+        parser = get_parser(bank)
+
+        # Выписка один раз режется на куски страниц, все куски сразу уходят в пул,
+        # а отдаём их строго по порядку, чтобы вызывающий код мог писать строки в базу,
+        # не дожидаясь конца разбора
+        loop = asyncio.get_running_loop()
+        chunk_pdfs = await loop.run_in_executor(
+            self._executor, split_pdf, pdf_content, self._pages_per_chunk,
+        )
+        chunks = [
+            loop.run_in_executor(self._executor, parse_pages, bank, chunk_pdf)
+            for chunk_pdf in chunk_pdfs
+        ]
+
+        accumulator = StatementAccumulator(user_id, parser)
+        try:
+            for chunk in chunks:
+                transactions = []
+                for page in await chunk:
+                    transactions.extend(accumulator.feed(page))
+                if transactions:
+                    yield transactions
+        finally:
+            for chunk in chunks:
+                chunk.cancel()
+
+        accumulator.close()
@@ -0,0 +1,26 @@
+import importlib
+from functools import cache
+
+from transaction_service.services.statement_parsers.base import BankStatementParser, StatementParseError
+
+# Банк из query-параметра bank -> "модуль:класс" парсера.
+# Модуль импортируется только при первой выписке этого банка
+PARSERS = {
+    'tbank': 'transaction_service.services.statement_parsers.tbank:TBankStatementParser',
+}
+
+
+class UnsupportedBankError(StatementParseError):
+    pass
+
+
+@cache
+def get_parser(bank: str) -> BankStatementParser:
+    try:
+        path = PARSERS[bank]
+    except KeyError:
+        raise UnsupportedBankError(f'Bank {bank!r} is not supported') from None
+
+    module_name, class_name = path.split(':')
+    parser_class = getattr(importlib.import_module(module_name), class_name)
+    return parser_class()
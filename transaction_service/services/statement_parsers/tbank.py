@@ -0,0 +1,40 @@
+import re
+from decimal import Decimal
+
+from transaction_service.services.statement_parsers.base import (
+    BankStatementParser,
+    ParsedPage,
+    date_from_str,
+    page_edges,
+    parse_amount,
+)
+
+
+class TBankStatementParser(BankStatementParser):
+    bank = 'tbank'
+
+    BALANCE_PATTERN = re.compile(r'Баланс на (\d{2}\.\d{2}\.\d{2})\s+([\d\s]+\.\d{2})\s*i', re.MULTILINE)
+    TRANSACTIONS_PATTERN = re.compile(
+        r'(\d{2}\.\d{2}\.\d{2})\s*(?:\d{2}:\d{2})?\s+(\d{2}\.\d{2}\.\d{2})\s+'
+        r'([+-]?\s*\d+(?:\s*\d{3})*(?:\.\d+)?\s*i)',
+        re.MULTILINE,
+    )
+
+    def parse_page_text(self, text: str) -> ParsedPage:
+        balance_matches = list(self.BALANCE_PATTERN.finditer(text))
+        transaction_matches = list(self.TRANSACTIONS_PATTERN.finditer(text))
+        balances = [parse_amount(match.group(2)) for match in balance_matches]
+
+        entries = []
+        for match in transaction_matches:
+            entry_date, receipt_date, amount = match.groups()
+            amount = amount.replace(' i', '')
+            withdraw, deposit = Decimal(), Decimal()
+            if '+' in amount:
+                deposit = parse_amount(amount.replace('+ ', ''))
+            else:
+                withdraw = parse_amount(amount)
+            entries.append((date_from_str(entry_date), date_from_str(receipt_date), withdraw, deposit))
+
+        head, tail = page_edges(text, balance_matches + transaction_matches)
+        return ParsedPage(balances=balances, entries=entries, head=head, tail=tail)
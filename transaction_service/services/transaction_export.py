@@ -0,0 +1,98 @@
+import csv
+import io
+import zlib
+from collections.abc import AsyncIterator, Callable, Sequence
+from datetime import datetime
+from typing import Optional
+from uuid import UUID
+
+from pydantic_core import to_json
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from transaction_service.schemas.transaction import TRANSACTION_RESPONSE_FIELDS
+from transaction_service.services.transaction_service import TransactionGateway
+
+EXPORT_COLUMNS = TRANSACTION_RESPONSE_FIELDS
+
+EXPORT_MEDIA_TYPES = {
+    'ndjson': 'application/x-ndjson',
+    'csv': 'text/csv',
+}
+
+
+def encode_ndjson(rows: Sequence[tuple]) -> bytes:
+    # pydantic-core пишет UUID, datetime и Decimal так же, как TransactionResponse в API
+    return b''.join(to_json(dict(zip(EXPORT_COLUMNS, row))) + b'\n' for row in rows)
+
+
+def encode_csv(rows: Sequence[tuple]) -> bytes:
+    buffer = io.StringIO()
+    csv.writer(buffer).writerows(rows)
+    return buffer.getvalue().encode()
+
+
+def csv_header() -> bytes:
+    buffer = io.StringIO()
+    csv.writer(buffer).writerow(EXPORT_COLUMNS)
+    return buffer.getvalue().encode()
+
+
+class TransactionExporter:
+    # Потоковая выгрузка истории пользователя. Тело ответа отдаётся уже после выхода из обработчика,
+    # когда сессия запроса закрыта, поэтому выгрузка открывает свою сессию на время генератора
+    def __init__(
+            self,
+            sessionmaker: async_sessionmaker,
+            gateway_factory: Callable[[AsyncSession], TransactionGateway],
+            batch_size: int,
+            gzip_level: int,
+    ):
+        self._sessionmaker = sessionmaker
+        self._gateway_factory = gateway_factory
+        self._batch_size = batch_size
+        self._gzip_level = gzip_level
+
+    async def export(
+            self,
+            user_id: UUID,
+            export_format: str,
+            start_date: Optional[datetime] = None,
+            end_date: Optional[datetime] = None,
+            gzip: bool = False,
+    ) -> AsyncIterator[bytes]:
+        chunks = self._encode(user_id, export_format, start_date, end_date)
+        if gzip:
+            chunks = self._compress(chunks)
+        async for chunk in chunks:
+            yield chunk
+
+    async def _encode(
+            self,
+            user_id: UUID,
+            export_format: str,
+            start_date: Optional[datetime],
+            end_date: Optional[datetime],
+    ) -> AsyncIterator[bytes]:
+        encode = encode_csv if export_format == 'csv' else encode_ndjson
+        if export_format == 'csv':
+            yield csv_header()
+
+        async with self._sessionmaker() as session:
+            batches = self._gateway_factory(session).iter_all(
+                user_id,
+                EXPORT_COLUMNS,
+                start_date=start_date,
+                end_date=end_date,
+                batch_size=self._batch_size,
+            )
+            async for rows in batches:
+                yield encode(rows)
+
+    async def _compress(self, chunks: AsyncIterator[bytes]) -> AsyncIterator[bytes]:
+        # wbits=31 - поток в формате gzip, а не голый zlib
+        compressor = zlib.compressobj(self._gzip_level, wbits=31)
+        async for chunk in chunks:
+            compressed = compressor.compress(chunk)
+            if compressed:
+                yield compressed
+        yield compressor.flush()
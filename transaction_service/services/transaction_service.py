@@ -1,40 +1,98 @@
-import uuid
-from datetime import datetime, timedelta
-from typing import List, Optional, Protocol
+from collections import defaultdict
+from collections.abc import AsyncIterator, Awaitable, Callable, Sequence
+from datetime import datetime
+from decimal import Decimal
+from typing import Any, List, Optional, Protocol
 from uuid import UUID
-from io import BytesIO
+
+from pydantic import TypeAdapter, ValidationError
+from pydantic_core import to_json
 
 from transaction_service.models import Transaction
 from transaction_service.models.transaction import EditedTransaction
 from transaction_service.schemas.transaction import (
+    TRANSACTION_RESPONSE_FIELDS,
+    BatchCreateResponse,
+    BatchItemError,
     TransactionCreate,
     TransactionResponse,
     ManyTransactionsResponse,
 )
-import PyPDF2
-import re
-from decimal import Decimal
+from transaction_service.services.expediency import expediency_score
+from transaction_service.services.statement_parsers import AccountStatementParser
+from transaction_service.utils.pagination import decode_cursor, encode_cursor
+
+
+_batch_adapter = TypeAdapter(list[TransactionCreate])
+
+
+def validate_batch(items: list[Any]) -> tuple[list[TransactionCreate], list[BatchItemError]]:
+    # Весь массив валидируется одним вызовом pydantic-core. Если в нём есть ошибки,
+    # они раскладываются по индексам элементов, а валидные элементы проверяются повторно
+    try:
+        return _batch_adapter.validate_python(items), []
+    except ValidationError as e:
+        failed = defaultdict(list)
+        for error in e.errors(include_url=False, include_input=False):
+            index, *loc = error['loc']
+            failed[index].append({'loc': loc, 'msg': error['msg'], 'type': error['type']})
+
+    valid = _batch_adapter.validate_python([item for i, item in enumerate(items) if i not in failed])
+    errors = [BatchItemError(index=index, errors=errors) for index, errors in sorted(failed.items())]
+    return valid, errors
+
+
+def encode_transactions_page(
+        rows: Sequence[Sequence[Any]],
+        total: Optional[int],
+        next_cursor: Optional[str],
+) -> bytes:
+    # JSON ManyTransactionsResponse прямо из кортежей TRANSACTION_RESPONSE_FIELDS:
+    # pydantic-core пишет UUID, datetime и Decimal так же, как сериализация модели
+    return to_json({
+        'total': total,
+        'results': [dict(zip(TRANSACTION_RESPONSE_FIELDS, row)) for row in rows],
+        'next_cursor': next_cursor,
+    })
 
 
 class TransactionGateway(Protocol):
-    async def create(self, transaction: TransactionCreate) -> Transaction:
+    async def create(self, transaction: TransactionCreate) -> Any:
+        raise NotImplementedError
+
+    async def create_many(self, transactions: Sequence[TransactionCreate]) -> Sequence[Any]:
+        raise NotImplementedError
+
+    async def create_account_stmt(self, transactions: list[dict], commit: bool = True) -> None:
         raise NotImplementedError
 
-    async def create_account_stmt(self, transactions: list) -> None:
+    async def commit(self) -> None:
         raise NotImplementedError
 
-    async def get(self, transaction_id: UUID) -> Optional[Transaction]:
+    async def get(self, transaction_id: UUID, for_update: bool = False) -> Optional[Transaction]:
         raise NotImplementedError
 
     async def get_all(
         self,
         user_id: UUID,
+        columns: Sequence[str],
         start_date: Optional[datetime] = None,
         end_date: Optional[datetime] = None,
         skip: int = 0,
         limit: int = 10,
-        status: Optional[str] = None,
-    ) -> tuple[List[Transaction], int]:
+        after: Optional[tuple[datetime, UUID]] = None,
+        include_total: bool = True,
+    ) -> tuple[List[Sequence[Any]], Optional[int]]:
+        raise NotImplementedError
+
+    def iter_all(
+        self,
+        user_id: UUID,
+        columns: Sequence[str],
+        start_date: Optional[datetime] = None,
+        end_date: Optional[datetime] = None,
+        batch_size: int = 1000,
+    ) -> AsyncIterator[Sequence[tuple]]:
         raise NotImplementedError
 
     async def get_avg_withdrawal_by_category(self, user_id: UUID, category: str):
@@ -52,51 +110,111 @@ class TransactionGateway(Protocol):
     async def get_all_edited(self):
         raise NotImplementedError
 
-    async def get_avg_withdrawal_by_user(self, user_id: UUID):
+    async def get_balance_summary(
+            self,
+            user_id: UUID,
+    ) -> Optional[tuple[Optional[Decimal], Optional[Decimal]]]:
         raise NotImplementedError
 
-    async def get_user_current_balance(self, user_id: UUID):
+    async def get_category_counters(self, user_id: UUID) -> dict[Optional[str], int]:
+        raise NotImplementedError
+
+    async def rebuild_category_counters(self, user_id: UUID) -> dict[Optional[str], int]:
+        raise NotImplementedError
+
+    async def has_tracked_transactions(self, user_id: UUID) -> bool:
         raise NotImplementedError
 
 
 class TransactionAnalyzer(Protocol):
-    def analyze(self, transaction_id: UUID):
+    async def analyze(self, transaction_id: UUID):
+        raise NotImplementedError
+
+    async def analyze_many(self, transaction_ids: list[UUID]):
         raise NotImplementedError
 
-    def fit_model(self):
+    async def fit_model(self, countdown: float = 0):
+        raise NotImplementedError
+
+
+class TransactionCache(Protocol):
+    async def get_or_load(
+            self,
+            transaction_id: UUID,
+            loader: Callable[[], Awaitable[Optional[TransactionResponse]]],
+    ) -> Optional[bytes]:
+        raise NotImplementedError
+
+    async def invalidate(self, transaction_ids: Sequence[UUID]) -> None:
+        raise NotImplementedError
+
+
+class ModelRetrainer(Protocol):
+    async def record_edit(self) -> None:
         raise NotImplementedError
 
 
 class TransactionService:
-    def __init__(self, repository: TransactionGateway, financial_category_analyzer: TransactionAnalyzer):
+    def __init__(
+            self,
+            repository: TransactionGateway,
+            financial_category_analyzer: TransactionAnalyzer,
+            statement_parser: AccountStatementParser,
+            model_retrainer: ModelRetrainer,
+            cache: TransactionCache,
+    ):
         self.repository = repository
         self.financial_category_analyzer = financial_category_analyzer
+        self.statement_parser = statement_parser
+        self.model_retrainer = model_retrainer
+        self.cache = cache
 
     async def create_transaction(
         self, transaction: TransactionCreate
     ) -> TransactionResponse:
         new_transaction = await self.repository.create(transaction)
-        self.financial_category_analyzer.analyze(new_transaction.id)
+        await self.financial_category_analyzer.analyze(new_transaction.id)
 
         return TransactionResponse.model_validate(new_transaction)
 
+    async def create_transactions(self, items: list[Any]) -> BatchCreateResponse:
+        # Невалидные элементы попадают в errors, остальные пишутся одним INSERT
+        # и уходят на анализ одним сообщением
+        transactions, errors = validate_batch(items)
+        created = await self.repository.create_many(transactions) if transactions else []
+        await self.financial_category_analyzer.analyze_many([ts.id for ts in created])
+
+        return BatchCreateResponse(
+            created=[TransactionResponse.model_validate(ts) for ts in created],
+            errors=errors,
+        )
+
     async def get_transaction(self, transaction_id: UUID) -> Optional[TransactionResponse]:
         transaction = await self.repository.get(transaction_id)
         if not transaction:
             return None
         return TransactionResponse.model_validate(transaction)
 
+    async def get_transaction_json(self, transaction_id: UUID) -> Optional[bytes]:
+        # Готовый JSON ответа из кэша; строку из базы грузим только на промахе
+        return await self.cache.get_or_load(transaction_id, lambda: self.get_transaction(transaction_id))
+
     async def process_account_statement(
         self,
         user_id: UUID,
         pdf_file: bytes,
         bank: Optional[str] = 'tbank',
     ) -> ManyTransactionsResponse:
-        dict_transactions = self._parse_account_stmt(pdf_file, user_id=user_id, bank=bank)
-        await self.repository.create_account_stmt(dict_transactions)
+        # Пишем строки по мере разбора страниц, коммитим выписку целиком
+        dict_transactions = []
+        async for transactions in self.statement_parser.iter_transactions(
+            pdf_file, user_id=user_id, bank=bank,
+        ):
+            await self.repository.create_account_stmt(transactions, commit=False)
+            dict_transactions.extend(transactions)
+        await self.repository.commit()
 
-        for ts in dict_transactions:
-            self.financial_category_analyzer.analyze(ts['id'])
+        await self.financial_category_analyzer.analyze_many([ts['id'] for ts in dict_transactions])
 
         return ManyTransactionsResponse(
             total=len(dict_transactions),
@@ -106,111 +224,52 @@ class TransactionService:
             )),
         )
 
-    async def get_transactions_by_user_id(
+    async def get_transactions_json(
         self,
         user_id: UUID,
         start_date: datetime,
         end_date: datetime,
         limit: int,
-        offset: int,
-    ) -> ManyTransactionsResponse:
+        offset: int = 0,
+        cursor: Optional[str] = None,
+        include_total: bool = True,
+    ) -> bytes:
+        # Берём на строку больше, чтобы понять, есть ли следующая страница
         transactions, total = await self.repository.get_all(
             user_id=user_id,
+            columns=TRANSACTION_RESPONSE_FIELDS,
             start_date=start_date,
             end_date=end_date,
             skip=offset,
-            limit=limit
+            limit=limit + 1,
+            after=decode_cursor(cursor) if cursor else None,
+            include_total=include_total,
         )
 
-        return ManyTransactionsResponse(
-            total=total,
-            results=[TransactionResponse.model_validate(ts) for ts in transactions],
-        )
+        next_cursor = None
+        # limit < 1 отсекает контроллер; без этой проверки срез пуст и transactions[-1] падает
+        if limit > 0 and len(transactions) > limit:
+            transactions = transactions[:limit]
+            next_cursor = encode_cursor(transactions[-1].receipt_date, transactions[-1].id)
+
+        return encode_transactions_page(transactions, total, next_cursor)
 
     async def get_categories_data(self, user_id: UUID):
-        transactions, total = await self.repository.get_all(
-            user_id=user_id,
-            limit=10_000_000
-        )
-        res = {}
-        for ts in transactions:
-            if not res.get(ts.category):
-                res[ts.category] = 1
-            else:
-                res[ts.category] += 1
-
-        return res, total
-
-
-    def _parse_account_stmt(self, pdf_content: bytes, user_id: UUID, bank: str):
-        if bank == 'tbank':
-            with BytesIO(pdf_content) as pdf_file:  # noqa
-                read_pdf = PyPDF2.PdfReader(pdf_file)
-                full_text = ""
-                for page in read_pdf.pages:
-                    full_text += page.extract_text()
-
-            balance_pattern = r'Баланс на (\d{2}\.\d{2}\.\d{2})\s+([\d\s]+\.\d{2})\s*i'
-
-            balances = re.findall(balance_pattern, full_text, re.MULTILINE)
-            # Преобразование в список словарей для удобства
-            balance_list = []
-            for _, amount in balances:
-                amount_float = float(amount.replace(' ', ''))
-                balance_list.append(amount_float)
-
-            balance_on_start, balance_on_end = map(lambda x: Decimal(x), balance_list)
-            print(balance_on_start, balance_on_end)
-
-            # pattern = r'(\d{2}\.\d{2}\.\d{2})*'
-            transactions_pattern = r'(\d{2}\.\d{2}\.\d{2})\s*(?:\d{2}:\d{2})?\s+(\d{2}\.\d{2}\.\d{2})\s+([+-]?\s*\d+(?:\s*\d{3})*(?:\.\d+)?\s*i)'
-
-            # Получаем список всех совпадений
-            matches = re.findall(transactions_pattern, full_text, re.MULTILINE)
-
-            # matches содержит список кортежей с захваченными группами
-
-            res = []
-            sum_wdraw = 0
-            sum_dep = 0
-            for match in matches:
-                print(match, match[0], match[1])
-                entry_date = self._date_from_str(match[0])
-                receipt_date = self._date_from_str(match[1])
-
-                data = {
-                    'id': uuid.uuid4(),
-                    'entry_date': entry_date,
-                    'receipt_date': receipt_date,
-                    'user_id': user_id,
-                    'withdraw': Decimal(),
-                    'deposit': Decimal(),
-                    'processing_status': 'in_progress',
-                    'category': None,
-                    'expediency': 0,
-                    'created_at': datetime.now(),
-                }
-
-                processed_amount = match[2].replace(' i', '')
-                if "+" in processed_amount:
-                    data['deposit'] = Decimal(processed_amount.replace("+ ", "").replace(" ", ""))
-                else:
-                    data['withdraw'] = Decimal(processed_amount.replace(" ", ""))
-
-                balance_on_start += data['deposit'] - data['withdraw']
-                data['balance'] = balance_on_start
-
-                sum_wdraw += data['deposit']
-                sum_dep += data['withdraw']
-                res.append(data)
-
-            return res
+        res = await self.repository.get_category_counters(user_id)
+        if not res and await self.repository.has_tracked_transactions(user_id):
+            # Транзакции у пользователя есть, а счётчиков нет - они потерялись; собираем через GROUP BY.
+            # Пользователь без транзакций сюда не попадает и пересчёт на каждый запрос не запускает
+            res = await self.repository.rebuild_category_counters(user_id)
+
+        return res, sum(res.values())
 
-        raise NotImplementedError
 
     async def get_financial_safety_cushion(self, user_id: UUID) -> tuple[float, float]:
-        avg_withdrawal = await self.repository.get_avg_withdrawal_by_user(user_id)
-        last_balance = await self.repository.get_user_current_balance(user_id)
+        summary = await self.repository.get_balance_summary(user_id)
+        if summary is None:
+            return 0, 0
+
+        last_balance, avg_withdrawal = summary
         if not (last_balance and avg_withdrawal):
             return 0, 0
 
@@ -218,28 +277,24 @@ class TransactionService:
 
 
     async def update_ts_category(self, transaction_id: UUID, category: str):
-        ts = await self.repository.get(transaction_id)
+        # Строка блокируется до коммита в save: иначе анализ воркера, закоммиченный между чтением
+        # и сохранением, поменяет категорию, а счётчики уменьшатся у прочитанной старой
+        ts = await self.repository.get(transaction_id, for_update=True)
         if ts is None:
             return None
 
-        ts.category = category
         avg = await self.repository.get_avg_withdrawal_by_category(
             user_id=ts.user_id,
-            category=ts.category,
+            category=category,
         )
-        if (category != 'Salary') and (avg is not None) and avg != 0:
-            coef = (ts.withdraw - avg) / avg
-            if coef > 20:
-                coef = 5
-            elif coef > 10:
-                coef = 3
-            elif coef > 5:
-                coef = 2
-            else:
-                coef = 1
-            ts.expediency = coef
+        # Категорию меняем после запросов: save берёт старую из истории атрибута для счётчиков
+        ts.category = category
+        expediency = expediency_score(category, ts.withdraw, avg)
+        if expediency:
+            ts.expediency = expediency
 
         await self.repository.save(ts)
+        await self.cache.invalidate([ts.id])
         await self.repository.add_edited(transaction=EditedTransaction(
             id=ts.id,
             user_id=ts.user_id,
@@ -251,12 +306,5 @@ class TransactionService:
             new_category=category,
             balance=ts.balance,
         ))
-        self.financial_category_analyzer.fit_model()
+        await self.model_retrainer.record_edit()
         return TransactionResponse.model_validate(ts)
-
-    @staticmethod
-    def _date_from_str(date_str: str):
-        date_str = date_str.strip()
-        updated_year = '20' + date_str.split('.')[-1]
-        date_str = '.'.join(date_str.split('.')[:2]) + '.' + updated_year
-        return datetime.strptime(date_str, '%d.%m.%Y')
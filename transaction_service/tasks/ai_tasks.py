@@ -1,28 +1,67 @@
 import asyncio
-import os
+import gc
+import logging
+import time
 from collections.abc import AsyncGenerator
+from typing import Optional
 from uuid import UUID
 
-from celery import Celery
-from dishka import Provider, Scope, make_async_container, provide
-from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_sessionmaker, create_async_engine
+from catboost import CatBoostError
+from celery.signals import worker_init, worker_process_init, worker_process_shutdown, worker_shutdown
+from celery.worker.control import control_command
+from dishka import AsyncContainer, Provider, Scope, make_async_container, provide
+from redis.asyncio import Redis
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_sessionmaker
 
-from transaction_service.config import load_config
 from transaction_service.repositories.transaction_repository import TransactionRepository
-import pandas as pd
-from catboost import CatBoostClassifier
+from transaction_service.services.ai_service import build_features, fit_model, predict_many
+from transaction_service.services.expediency import expediency_score
+from transaction_service.services.model_registry import ModelRegistry
+from transaction_service.tasks.celery_app import (
+    ANALYZE_TRANSACTION_TASK,
+    ANALYZE_TRANSACTIONS_BATCH_TASK,
+    FIT_MODEL_TASK,
+    RELOAD_MODEL_COMMAND,
+    celery_app,
+    cfg,
+)
+from transaction_service.tasks.model_server import ModelServer
+from transaction_service.tasks.runtime import WorkerRuntime
+from transaction_service.utils.cache import RedisTransactionCache
+from transaction_service.utils.database import create_engine
+from transaction_service.utils.process_memory import format_memory_usage
+from transaction_service.utils.metrics import (
+    ANALYSIS_BATCH_DURATION,
+    ANALYSIS_BATCH_SIZE,
+    MODEL_FIT_DURATION,
+    RETRAIN_QUEUE_DEPTH,
+)
 
-from transaction_service.services.ai_service import predict, fit_model
-from transaction_service.utils.metrics import TOTAL_MESSAGES_PRODUCED
+logger = logging.getLogger(__name__)
 
-cfg = load_config(os.getenv('TRANSACTION_SERVICE_CONFIG_PATH', './configs/app.toml'))
-celery_app = Celery('tasks', broker=cfg.rabbitmq.uri)
+# Ключ pg advisory lock, под которым идёт обучение модели
+FIT_MODEL_LOCK_ID = 7_201_001
+
+# Модель, загруженная в главном процессе celery до fork (см. preload_model).
+# Дочерние процессы prefork получают её готовой и делят страницы copy-on-write
+preloaded_model_server: Optional[ModelServer] = None
+# Когда стартовал дочерний процесс и успел ли он сделать первое предсказание - для лога
+process_started_at: Optional[float] = None
+first_prediction_done = False
+
+
+def build_model_server(reload_interval: Optional[float]) -> ModelServer:
+    registry = ModelRegistry(cfg.model.registry_path, base_model_path=cfg.model.base_path)
+    return ModelServer(registry, reload_interval=reload_interval)
 
 
 class DatabaseProvider(Provider):
     @provide(scope=Scope.APP)
-    def get_engine(self) -> AsyncEngine:
-        return create_async_engine(cfg.db.uri, echo=True)
+    async def get_engine(self) -> AsyncGenerator[AsyncEngine, None]:
+        engine = create_engine(cfg.db, application_name='transaction_service_worker')
+        yield engine
+        await engine.dispose()
 
     @provide(scope=Scope.APP)
     def get_sessionmaker(self, engine: AsyncEngine) -> async_sessionmaker:
@@ -37,129 +76,285 @@ class DatabaseProvider(Provider):
             yield session
 
     @provide(scope=Scope.APP)
-    async def get_model(self) -> CatBoostClassifier:
-        return CatBoostClassifier().load_model('model.cbm')
+    async def get_transaction_cache(self) -> AsyncGenerator[RedisTransactionCache, None]:
+        # Воркер только инвалидирует закэшированные ответы API: L1 и подписка ему не нужны
+        redis_client = Redis.from_url(cfg.redis.uri)
+        yield RedisTransactionCache(
+            redis_client,
+            ttl=cfg.cache.ttl,
+            l1_size=cfg.cache.l1_size,
+            lock_timeout=cfg.cache.lock_timeout,
+        )
+        await redis_client.aclose()
+
+    @provide(scope=Scope.APP)
+    async def get_model_server(self) -> AsyncGenerator[ModelServer, None]:
+        if preloaded_model_server is not None:
+            yield preloaded_model_server
+            return
+        # stream_worker и celery без preload: процесс сам грузит модель и следит за ACTIVE.
+        # Загрузка и прогрев идут в потоке, чтобы не останавливать задачи на общем loop
+        model_server = await asyncio.to_thread(build_model_server, cfg.model.reload_interval)
+        model_server.start()
+        yield model_server
+        await model_server.close()
+
+
+runtime = WorkerRuntime(
+    lambda: make_async_container(DatabaseProvider()),
+    shutdown_timeout=cfg.worker.shutdown_timeout,
+)
+
+
+@worker_init.connect
+def preload_model(**kwargs):
+    # Главный процесс celery, до запуска пула. Версию модели он сам не опрашивает:
+    # новую подгружает команда reload_model, после чего пул пересоздаётся форком
+    global preloaded_model_server
+    if not cfg.model.preload:
+        return
+    start_time = time.monotonic()
+    preloaded_model_server = build_model_server(reload_interval=None)
+    # Объекты, созданные до fork, уходят из-под сборщика мусора: его проходы в дочерних
+    # процессах иначе пишут в заголовки объектов и копируют разделяемые страницы
+    gc.freeze()
+    logger.info(
+        'Model %s preloaded in %.3f s, %s',
+        preloaded_model_server.version, time.monotonic() - start_time, format_memory_usage(),
+    )
+
+
+@control_command(name=RELOAD_MODEL_COMMAND)
+def reload_model(state, **kwargs):
+    # Выполняется в главном процессе каждого воркера, получившего broadcast
+    if preloaded_model_server is None:
+        return {'ok': 'model is not preloaded'}
+    if not preloaded_model_server.reload():
+        return {'ok': f'model {preloaded_model_server.version} is up to date'}
+
+    gc.freeze()
+    # Как pool_restart без перезагрузки модулей: дочерние процессы доделывают текущие задачи
+    # и заменяются новыми форками с новой моделью. В solo/threads пул не перезапускается -
+    # задачи идут в этом же процессе и уже видят новую модель
+    state.consumer.controller.reload(modules=[])
+    logger.info('Model %s reloaded, %s', preloaded_model_server.version, format_memory_usage())
+    return {'ok': f'model {preloaded_model_server.version} reloaded'}
 
 
-container = make_async_container(DatabaseProvider())
+@worker_process_init.connect
+def start_worker_runtime(**kwargs):
+    global process_started_at
+    process_started_at = time.monotonic()
+    logger.info('Worker process started, %s', format_memory_usage())
+    runtime.start()
+
+
+@worker_process_shutdown.connect
+@worker_shutdown.connect
+def stop_worker_runtime(**kwargs):
+    runtime.stop()
+
 
 def run_async(coro):
-    loop = asyncio.get_event_loop()
-    return loop.run_until_complete(coro)
+    return runtime.run(coro)
 
 
+async def analyze_transactions(container: AsyncContainer, transaction_ids: list[UUID]):
+    # Общая часть celery-задач и консьюмера Redis Streams (stream_worker)
+    start_time = time.monotonic()
+    model_server = await container.get(ModelServer)
+    cache = await container.get(RedisTransactionCache)
+    _, model = model_server.get()
+    async with container() as request_container:
+        session = await request_container.get(AsyncSession)
+        repo = TransactionRepository(session=session)
+        transactions = await repo.get_many(transaction_ids)
+        if not transactions:
+            return
 
-@celery_app.task
-def process_transaction_analysis(transaction_id: UUID):
-    async def inner():
-        model = await container.get(CatBoostClassifier)
-        async with container() as request_container:
-            session = await request_container.get(AsyncSession)
-            repo = TransactionRepository(session=session)
-            transaction = await repo.get(transaction_id)
-            if not transaction:
-                return
+        # Строки без баланса или дат модель не примет - build_features их выбросит
+        # и предсказания съедут относительно транзакций
+        broken = [ts.id for ts in transactions if None in (ts.balance, ts.entry_date, ts.receipt_date)]
+        transactions = [ts for ts in transactions if ts.id not in broken]
+        if broken:
+            await repo.update_status_many(broken, "failed")
 
-            try:
-                result = predict(model, pd.DataFrame(data={
-                    'Date': [transaction.entry_date.strftime('%d/%m/%Y')],
-                    'Date.1': [transaction.receipt_date.strftime('%d/%m/%Y')],
-                    'Balance': [transaction.balance],
-                    'Withdrawal': [transaction.withdraw],
-                    'Deposit': [transaction.deposit],
-                }))
-
-                # oldest_ts_time = await repo.get_oldest_ts(user_id=transaction.user_id)
-                # print(oldest_ts_time)
-                # if transaction.withdraw and oldest_ts_time < (datetime.now() - timedelta(days=29)):
-
-                avg = await repo.get_avg_withdrawal_by_category(
-                    user_id=transaction.user_id,
-                    category=result,
+        try:
+            if transactions:
+                # Предсказание - CPU и без GIL внутри catboost: уносим из loop, чтобы
+                # параллельные задачи процесса в это время ходили в базу
+                features = build_features(
+                    entry_dates=[ts.entry_date for ts in transactions],
+                    receipt_dates=[ts.receipt_date for ts in transactions],
+                    balances=[ts.balance for ts in transactions],
+                    withdrawals=[ts.withdraw for ts in transactions],
+                    deposits=[ts.deposit for ts in transactions],
                 )
-                print(f'Avg for {transaction.user_id} {result}: {avg}')
-                if (result != 'Salary') and (avg is not None):
-                    coef = (transaction.withdraw - avg) / avg
-
-                    print(f'Coef for ts {transaction.id}:', coef)
-                    if coef > 20:
-                        coef = 5
-                    elif coef > 10:
-                        coef = 3
-                    elif coef > 5:
-                        coef = 2
-                    else:
-                        coef = 1
-                else:
-                    coef = 0
-                await repo.update_analysis(
-                    transaction_id,
-                    category=result,
-                    status="completed",
-                    expediency=coef,
+                categories = await asyncio.to_thread(predict_many, model, features)
+                _log_first_prediction()
+                results = await _build_analysis_results(
+                    repo,
+                    [
+                        (ts.id, ts.user_id, ts.withdraw, category)
+                        for ts, category in zip(transactions, categories)
+                    ],
                 )
-            except Exception:
-                await repo.update_status(transaction_id, "failed")
-                raise  # Повторно выбрасываем исключение для логирования Celery
+                await repo.update_analysis_many(results)
+        except Exception:
+            await session.rollback()
+            await repo.update_status_many([ts.id for ts in transactions], "failed")
+            raise  # Повторно выбрасываем исключение для логирования Celery
+        finally:
+            # Статус и категория строк поменялись - закэшированные ответы API устарели
+            await cache.invalidate([ts.id for ts in transactions] + broken)
 
-    return run_async(inner())
+    ANALYSIS_BATCH_SIZE.observe(len(transactions))
+    ANALYSIS_BATCH_DURATION.observe(time.monotonic() - start_time)
 
 
-@celery_app.task
-def process_fit_model():
+def _log_first_prediction() -> None:
+    global first_prediction_done
+    if first_prediction_done or process_started_at is None:
+        return
+    first_prediction_done = True
+    logger.info(
+        'First prediction %.3f s after worker process start, %s',
+        time.monotonic() - process_started_at, format_memory_usage(),
+    )
+
+
+async def _build_analysis_results(repo: TransactionRepository, analyzed: list[tuple]) -> list[dict]:
+    # analyzed: [(transaction_id, user_id, withdraw, category), ...]
+    # Среднее считаем один раз на пару (пользователь, категория), а не на каждую транзакцию
+    avg_by_category = {}
+    results = []
+    for transaction_id, user_id, withdraw, category in analyzed:
+        key = (user_id, category)
+        if key not in avg_by_category:
+            avg_by_category[key] = await repo.get_avg_withdrawal_by_category(
+                user_id=user_id,
+                category=category,
+            )
+        results.append({
+            'id': transaction_id,
+            'category': category,
+            'expediency': expediency_score(category, withdraw, avg_by_category[key]),
+            'processing_status': "completed",
+        })
+    return results
+
+
+@celery_app.task(name=ANALYZE_TRANSACTIONS_BATCH_TASK)
+def process_transactions_batch_analysis(transaction_ids: list[UUID]):
+    # Выписка приходит одним сообщением, а модель гоняем пачками по batch_size.
+    # Упавшая пачка помечает failed только свои строки, остальные пачки всё равно анализируются;
+    # ошибка уходит celery после всех пачек
     async def inner():
-        model = await container.get(CatBoostClassifier)
+        batch_size = cfg.analysis.batch_size
+        errors = []
+        for i in range(0, len(transaction_ids), batch_size):
+            chunk = transaction_ids[i:i + batch_size]
+            try:
+                await analyze_transactions(runtime.container, chunk)
+            except Exception as e:
+                logger.exception('Failed to analyze %d transactions of a batch', len(chunk))
+                await _mark_failed(runtime.container, chunk)
+                errors.append(e)
+        if errors:
+            raise errors[0]
+
+    return run_async(inner())
+
+
+async def _mark_failed(container: AsyncContainer, transaction_ids: list[UUID]) -> None:
+    # analyze_transactions помечает failed сам, если упал анализ; здесь - строки пачки, которая
+    # упала раньше или позже (чтение, кэш). Уже обработанные строки не трогаем
+    try:
         async with container() as request_container:
             session = await request_container.get(AsyncSession)
             repo = TransactionRepository(session=session)
+            await repo.update_status_many(transaction_ids, "failed", from_status="in_progress")
+        cache = await container.get(RedisTransactionCache)
+        await cache.invalidate(transaction_ids)
+    except Exception:
+        logger.exception('Failed to mark %d transactions as failed', len(transaction_ids))
+
+
+@celery_app.task(name=ANALYZE_TRANSACTION_TASK)
+def process_transaction_analysis(transaction_id: UUID):
+    return run_async(analyze_transactions(runtime.container, [transaction_id]))
+
+
+@celery_app.task(name=FIT_MODEL_TASK)
+def process_fit_model():
+    async def inner():
+        model_server = await runtime.container.get(ModelServer)
+        cache = await runtime.container.get(RedisTransactionCache)
+        engine = await runtime.container.get(AsyncEngine)
+        # Отдельное соединение держит advisory-lock всё обучение: второй воркер, получивший
+        # задачу в это же время, просто выходит - его правки заберёт текущее обучение или следующее окно
+        async with engine.connect() as lock_connection:
+            locked = await lock_connection.scalar(select(func.pg_try_advisory_lock(FIT_MODEL_LOCK_ID)))
+            if not locked:
+                return
+            try:
+                await _fit_model(model_server, cache)
+            finally:
+                await lock_connection.scalar(select(func.pg_advisory_unlock(FIT_MODEL_LOCK_ID)))
 
-            edited = await repo.get_all_edited()
-            if len(edited) > 10:
-                fit_model(model, pd.DataFrame(data={
-                    'Date': [ts.entry_date.strftime('%d/%m/%Y') for ts in edited],
-                    'Date.1': [ts.receipt_date.strftime('%d/%m/%Y') for ts in edited],
-                    'Balance': [ts.balance for ts in edited],
-                    'Category': [ts.new_category for ts in edited],
-                    'Withdrawal': [ts.withdraw for ts in edited],
-                    'Deposit': [ts.deposit for ts in edited],
-                }))
-                await repo.drop_edited()
-
-            for transaction in edited:
-                oldest_ts_time = await repo.get_oldest_ts(user_id=transaction.user_id)
-                # if transaction.withdraw and oldest_ts_time < (datetime.now() - timedelta(days=29)):
-                avg = await repo.get_avg_withdrawal_by_category(
-                    user_id=transaction.user_id,
-                    category=transaction.new_category,
-                )
-                if (transaction.new_category != 'Salary') and (avg is not None) and avg != 0:
-                    coef = (transaction.withdraw - avg) / avg
-
-                    if coef > 20:
-                        coef = 5
-                    elif coef > 10:
-                        coef = 3
-                    elif coef > 5:
-                        coef = 2
-                    else:
-                        coef = 1
-                else:
-                    coef = 0
-                await repo.update_analysis(
-                    transaction.id,
-                    category=transaction.new_category,
-                    status="completed",
-                    expediency=coef,
-                )
     return run_async(inner())
 
 
-# Celery forces doing outer encapsulation
-class AIRemoteTransactionAnalyzer:
-    def analyze(self, transaction_id: UUID):
-        process_transaction_analysis.delay(transaction_id)
-        TOTAL_MESSAGES_PRODUCED.inc()
+async def _train_on_edits(model_server: ModelServer, edited) -> bool:
+    _, model = model_server.get()
+    start_time = time.monotonic()
+    try:
+        fitted = await asyncio.to_thread(
+            fit_model,
+            model,
+            build_features(
+                entry_dates=[ts.entry_date for ts in edited],
+                receipt_dates=[ts.receipt_date for ts in edited],
+                balances=[ts.balance for ts in edited],
+                withdrawals=[ts.withdraw for ts in edited],
+                deposits=[ts.deposit for ts in edited],
+                categories=[ts.new_category for ts in edited],
+            ),
+            iterations=cfg.retrain.fit_iterations,
+            learning_rate=cfg.retrain.fit_learning_rate,
+        )
+    except CatBoostError:
+        # Текущая модель остаётся активной, правки - в очереди до следующего обучения
+        logger.exception('Failed to fit model %s on %d edits', model_server.version, len(edited))
+        return False
+    MODEL_FIT_DURATION.observe(time.monotonic() - start_time)
+    # Обученная модель прогревается, публикуется в реестре и подменяет текущую;
+    # остальные воркеры подхватят её по файлу ACTIVE
+    await asyncio.to_thread(model_server.promote, fitted)
+    # Главные процессы воркеров подгружают новую версию и пересоздают пулы
+    await asyncio.to_thread(celery_app.control.broadcast, RELOAD_MODEL_COMMAND)
+    return True
+
+
+async def _fit_model(model_server: ModelServer, cache: RedisTransactionCache):
+    async with runtime.container() as request_container:
+        session = await request_container.get(AsyncSession)
+        repo = TransactionRepository(session=session)
+
+        edited = await repo.get_all_edited()
+        RETRAIN_QUEUE_DEPTH.set(len(edited))
+        if len(edited) > cfg.retrain.fit_threshold and await _train_on_edits(model_server, edited):
+            # Удаление обученных правок коммитится вместе с переразметкой ниже
+            await repo.drop_edited([(ts.id, ts.created_at) for ts in edited], commit=False)
+            RETRAIN_QUEUE_DEPTH.set(0)
+
+        # Одну транзакцию могли поправить несколько раз - применяем последнюю правку
+        latest_edits = {}
+        for transaction in sorted(edited, key=lambda ts: ts.created_at):
+            latest_edits[transaction.id] = transaction
 
-    def fit_model(self):
-        process_fit_model.delay()
-        TOTAL_MESSAGES_PRODUCED.inc()
+        results = await _build_analysis_results(repo, [
+            (ts.id, ts.user_id, ts.withdraw, ts.new_category) for ts in latest_edits.values()
+        ])
+        await repo.update_analysis_many(results)
+        await cache.invalidate(list(latest_edits))
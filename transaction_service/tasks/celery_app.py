@@ -0,0 +1,19 @@
+import os
+
+from celery import Celery
+
+from transaction_service.config import load_config
+
+# Приложение celery без реализаций задач: его импортирует и API (только публикует задачи),
+# и воркер (tasks.ai_tasks регистрирует задачи под этими именами)
+cfg = load_config(os.getenv('TRANSACTION_SERVICE_CONFIG_PATH', './configs/app.toml'))
+celery_app = Celery('tasks', broker=cfg.rabbitmq.uri)
+# Нужно команде reload_model: дочерние процессы пересоздаются форком уже с новой моделью
+celery_app.conf.worker_pool_restarts = True
+
+# Имена совпадают с прежними автоматическими именами задач, чтобы сообщения в очереди не потерялись
+_TASKS_MODULE = 'transaction_service.tasks.ai_tasks'
+ANALYZE_TRANSACTION_TASK = f'{_TASKS_MODULE}.process_transaction_analysis'
+ANALYZE_TRANSACTIONS_BATCH_TASK = f'{_TASKS_MODULE}.process_transactions_batch_analysis'
+FIT_MODEL_TASK = f'{_TASKS_MODULE}.process_fit_model'
+RELOAD_MODEL_COMMAND = 'reload_model'
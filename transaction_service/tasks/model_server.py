@@ -0,0 +1,76 @@
+import asyncio
+import logging
+import threading
+from typing import Optional
+
+from transaction_service.services.ai_service import warm_up
+from transaction_service.services.model_registry import ModelRegistry
+
+logger = logging.getLogger(__name__)
+
+
+class ModelServer:
+    # Держит активную модель воркера. Задачи берут пару (версия, модель) один раз на пачку,
+    # get() только отдаёт текущую ссылку. Новая модель загружается и прогревается целиком
+    # вне пути инференса - в фоновом наблюдателе (start()) или в reload()/promote(),
+    # вызванных из потока, - и подменяет ссылку одним присваиванием,
+    # поэтому инференс на время переключения не останавливается.
+    # reload_interval=None - версию сам не проверяет, новую модель подгружают через reload()
+    def __init__(self, registry: ModelRegistry, reload_interval: Optional[float] = 5.0):
+        self.registry = registry
+        self.reload_interval = reload_interval
+        # Загрузку из наблюдателя и promote после обучения не выполняем одновременно
+        self._swap_lock = threading.Lock()
+        self._watcher: Optional[asyncio.Task] = None
+
+        version = registry.active_version()
+        self._current = (version, self._prepare(registry.load(version)))
+
+    @property
+    def version(self) -> str:
+        return self._current[0]
+
+    def get(self):
+        return self._current
+
+    def start(self) -> None:
+        # Новую версию мог опубликовать другой процесс - проверяем ACTIVE раз в reload_interval
+        if self.reload_interval is not None:
+            self._watcher = asyncio.create_task(self._watch())
+
+    async def close(self) -> None:
+        if self._watcher is not None:
+            self._watcher.cancel()
+            await asyncio.gather(self._watcher, return_exceptions=True)
+
+    def reload(self) -> bool:
+        # Блокирующий вызов: чтение с диска и прогрев, с event loop - только через поток
+        with self._swap_lock:
+            version = self.registry.active_version()
+            if version == self._current[0]:
+                return False
+            self._current = (version, self._prepare(self.registry.load(version)))
+            return True
+
+    def promote(self, model) -> str:
+        # Прогрев до публикации: модель, которая не может предсказывать, не станет активной
+        with self._swap_lock:
+            model = self._prepare(model)
+            version = self.registry.publish(model)
+            self._current = (version, model)
+            return version
+
+    async def _watch(self) -> None:
+        while True:
+            await asyncio.sleep(self.reload_interval)
+            try:
+                if await asyncio.to_thread(self.reload):
+                    logger.info('Model %s loaded', self.version)
+            except Exception:
+                # Битая или недописанная версия: продолжаем на текущей, попробуем в следующий раз
+                logger.exception('Failed to reload model')
+
+    @staticmethod
+    def _prepare(model):
+        warm_up(model)
+        return model
@@ -0,0 +1,101 @@
+import asyncio
+import logging
+import signal
+import time
+
+from dishka import AsyncContainer
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from transaction_service.config import Config, OutboxConfig
+from transaction_service.di import setup_di
+from transaction_service.repositories.transaction_repository import TransactionRepository
+from transaction_service.services.transaction_service import TransactionAnalyzer, TransactionCache
+from transaction_service.utils.metrics import OUTBOX_RELAYED, OUTBOX_STUCK_REQUEUED
+
+logger = logging.getLogger(__name__)
+
+
+class OutboxRelay:
+    # Переотправляет задачи из analysis_outbox, которые не выполнились за publish_delay:
+    # сообщение потерялось по дороге в брокер или воркер упал. Пачка уходит одним analyze_many
+    # через тот же аналайзер, что и у API. Несколько релеев могут работать одновременно - строки
+    # разбираются через SKIP LOCKED
+    def __init__(self, container: AsyncContainer, cfg: OutboxConfig):
+        self._container = container
+        self._cfg = cfg
+        self._stuck_checked_at = 0.0
+
+    async def run(self, stop: asyncio.Event) -> None:
+        while not stop.is_set():
+            if time.monotonic() - self._stuck_checked_at >= self._cfg.stuck_check_interval:
+                self._stuck_checked_at = time.monotonic()
+                await self.enqueue_stuck()
+
+            if await self.relay_batch() < self._cfg.batch_size:
+                try:
+                    await asyncio.wait_for(stop.wait(), self._cfg.poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+
+    async def relay_batch(self) -> int:
+        analyzer = await self._container.get(TransactionAnalyzer)
+        async with self._container() as request_container:
+            session = await request_container.get(AsyncSession)
+            repo = TransactionRepository(session)
+
+            rows = await repo.outbox.claim(self._cfg.batch_size, publish_delay=self._cfg.publish_delay)
+            pending = [
+                (id_, transaction_id) for id_, transaction_id, attempts in rows
+                if attempts < self._cfg.max_attempts
+            ]
+            expired = [
+                transaction_id for _, transaction_id, attempts in rows
+                if attempts >= self._cfg.max_attempts
+            ]
+
+            if pending:
+                await analyzer.analyze_many([transaction_id for _, transaction_id in pending])
+                await repo.outbox.mark_published([id_ for id_, _ in pending], self._cfg.retry_delay)
+            if expired:
+                logger.warning('Giving up on analysis of %d transactions', len(expired))
+                await repo.update_status_many(expired, 'failed', commit=False)
+            await session.commit()
+
+        if expired:
+            cache = await self._container.get(TransactionCache)
+            await cache.invalidate(expired)
+
+        OUTBOX_RELAYED.inc(len(pending))
+        return len(rows)
+
+    async def enqueue_stuck(self) -> None:
+        async with self._container() as request_container:
+            session = await request_container.get(AsyncSession)
+            repo = TransactionRepository(session)
+            requeued = await repo.outbox.enqueue_stuck(self._cfg.stuck_after, limit=self._cfg.batch_size)
+            await session.commit()
+
+        if requeued:
+            logger.info('Requeued %d stuck in_progress transactions', requeued)
+            OUTBOX_STUCK_REQUEUED.inc(requeued)
+
+
+async def main() -> None:
+    container = setup_di()
+    cfg = await container.get(Config)
+    relay = OutboxRelay(container, cfg.outbox)
+
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop.set)
+
+    try:
+        await relay.run(stop)
+    finally:
+        await container.close()
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(main())
@@ -0,0 +1,31 @@
+from uuid import UUID
+
+from transaction_service.tasks.celery_app import (
+    ANALYZE_TRANSACTION_TASK,
+    ANALYZE_TRANSACTIONS_BATCH_TASK,
+    FIT_MODEL_TASK,
+    celery_app,
+)
+from transaction_service.utils.metrics import TOTAL_MESSAGES_PRODUCED
+
+# Сигнатуры задач по имени: публикующей стороне не нужен модуль воркера с pandas и catboost
+process_transaction_analysis = celery_app.signature(ANALYZE_TRANSACTION_TASK)
+process_transactions_batch_analysis = celery_app.signature(ANALYZE_TRANSACTIONS_BATCH_TASK)
+process_fit_model = celery_app.signature(FIT_MODEL_TASK)
+
+
+# Celery forces doing outer encapsulation
+class AIRemoteTransactionAnalyzer:
+    async def analyze(self, transaction_id: UUID):
+        process_transaction_analysis.delay(transaction_id)
+        TOTAL_MESSAGES_PRODUCED.inc()
+
+    async def analyze_many(self, transaction_ids: list[UUID]):
+        if not transaction_ids:
+            return
+        process_transactions_batch_analysis.delay(transaction_ids)
+        TOTAL_MESSAGES_PRODUCED.inc()
+
+    async def fit_model(self, countdown: float = 0):
+        process_fit_model.apply_async(countdown=countdown)
+        TOTAL_MESSAGES_PRODUCED.inc()
@@ -0,0 +1,80 @@
+import asyncio
+import logging
+import time
+from typing import Optional
+from uuid import UUID
+
+from transaction_service.tasks.producer import process_fit_model, process_transactions_batch_analysis
+from transaction_service.utils.metrics import (
+    PUBLISHER_BUFFER_DEPTH,
+    PUBLISHER_FLUSH_DURATION,
+    TOTAL_MESSAGES_PRODUCED,
+)
+
+logger = logging.getLogger(__name__)
+
+
+class BufferedTransactionAnalyzer:
+    # Celery-аналайзер для API: analyze() только кладёт id в ограниченный буфер, а фоновая задача
+    # раз в flush_interval (или набрав max_batch) отправляет накопленное одним сообщением
+    # process_transactions_batch_analysis. Публикация в RabbitMQ идёт в потоке и loop не блокирует.
+    # Заполненный буфер - backpressure: analyze() ждёт, пока фоновая задача его разгребёт
+    def __init__(self, max_pending: int, max_batch: int, flush_interval: float):
+        self._queue: asyncio.Queue[list[UUID]] = asyncio.Queue(maxsize=max_pending)
+        self._max_batch = max_batch
+        self._flush_interval = flush_interval
+        self._flusher: Optional[asyncio.Task] = None
+
+    def start(self) -> None:
+        self._flusher = asyncio.create_task(self._run())
+
+    async def close(self) -> None:
+        # Отправляем всё, что успели принять, и только потом гасим фоновую задачу
+        await self._queue.join()
+        self._flusher.cancel()
+
+    async def analyze(self, transaction_id: UUID):
+        await self._put([transaction_id])
+
+    async def analyze_many(self, transaction_ids: list[UUID]):
+        if transaction_ids:
+            await self._put(transaction_ids)
+
+    async def fit_model(self, countdown: float = 0):
+        await asyncio.to_thread(process_fit_model.apply_async, countdown=countdown)
+        TOTAL_MESSAGES_PRODUCED.inc()
+
+    async def _put(self, transaction_ids: list[UUID]) -> None:
+        await self._queue.put(transaction_ids)
+        PUBLISHER_BUFFER_DEPTH.set(self._queue.qsize())
+
+    async def _run(self) -> None:
+        while True:
+            batch = [await self._queue.get()]
+            size = len(batch[0])
+            deadline = time.monotonic() + self._flush_interval
+            while size < self._max_batch:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+                size += len(batch[-1])
+
+            await self._flush(batch)
+            for _ in batch:
+                self._queue.task_done()
+            PUBLISHER_BUFFER_DEPTH.set(self._queue.qsize())
+
+    async def _flush(self, batch: list[list[UUID]]) -> None:
+        transaction_ids = [transaction_id for ids in batch for transaction_id in ids]
+        start_time = time.monotonic()
+        try:
+            await asyncio.to_thread(process_transactions_batch_analysis.delay, transaction_ids)
+            TOTAL_MESSAGES_PRODUCED.inc()
+        except Exception:
+            # Задачи остались в analysis_outbox - через publish_delay их переотправит outbox_relay
+            logger.exception('Failed to publish %d transactions for analysis', len(transaction_ids))
+        PUBLISHER_FLUSH_DURATION.observe(time.monotonic() - start_time)
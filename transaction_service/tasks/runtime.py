@@ -0,0 +1,76 @@
+import asyncio
+import logging
+import threading
+from collections.abc import Callable, Coroutine
+from typing import Any, Optional, TypeVar
+
+from dishka import AsyncContainer
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar('T')
+
+
+class WorkerRuntime:
+    # Один долгоживущий event loop на процесс воркера в отдельном потоке и DI-контейнер,
+    # созданный уже в этом процессе (после fork). Задачи celery отдают в loop корутины
+    # и ждут результат, поэтому при --pool threads несколько задач процесса выполняются
+    # на одном loop одновременно и делят один пул соединений
+    def __init__(self, container_factory: Callable[[], AsyncContainer], shutdown_timeout: float = 30.0):
+        self._container_factory = container_factory
+        self._shutdown_timeout = shutdown_timeout
+        self._lock = threading.Lock()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+        self._container: Optional[AsyncContainer] = None
+
+    @property
+    def container(self) -> AsyncContainer:
+        if self._container is None:
+            raise RuntimeError('Worker runtime is not started')
+        return self._container
+
+    def start(self) -> None:
+        with self._lock:
+            if self._loop is not None:
+                return
+            loop = asyncio.new_event_loop()
+            thread = threading.Thread(
+                target=self._run_loop,
+                args=(loop,),
+                name='worker-event-loop',
+                daemon=True,
+            )
+            thread.start()
+            self._container = self._container_factory()
+            self._loop, self._thread = loop, thread
+
+    def run(self, coro: Coroutine[Any, Any, T]) -> T:
+        # worker_process_init приходит только в prefork; в solo/threads и при вызове задачи
+        # напрямую loop поднимается при первой задаче
+        if self._loop is None:
+            self.start()
+        return asyncio.run_coroutine_threadsafe(coro, self._loop).result()
+
+    def stop(self) -> None:
+        with self._lock:
+            loop, thread, container = self._loop, self._thread, self._container
+            self._loop = self._thread = self._container = None
+        if loop is None:
+            return
+
+        # Закрытие контейнера закрывает engine и возвращает соединения пула серверу
+        future = asyncio.run_coroutine_threadsafe(container.close(), loop)
+        try:
+            future.result(timeout=self._shutdown_timeout)
+        except Exception:
+            logger.exception('Failed to close worker container')
+        loop.call_soon_threadsafe(loop.stop)
+        thread.join(timeout=self._shutdown_timeout)
+        if not thread.is_alive():
+            loop.close()
+
+    @staticmethod
+    def _run_loop(loop: asyncio.AbstractEventLoop) -> None:
+        asyncio.set_event_loop(loop)
+        loop.run_forever()
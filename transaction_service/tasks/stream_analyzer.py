@@ -0,0 +1,51 @@
+from collections.abc import Iterable
+from uuid import UUID
+
+from redis.asyncio import Redis
+
+from transaction_service.config import AnalysisConfig
+from transaction_service.services.transaction_service import TransactionAnalyzer
+from transaction_service.utils.metrics import TOTAL_MESSAGES_PRODUCED
+
+IDS_FIELD = b'ids'
+
+
+def encode_ids(transaction_ids: Iterable[UUID]) -> str:
+    return ','.join(str(transaction_id) for transaction_id in transaction_ids)
+
+
+def decode_ids(value: bytes) -> list[UUID]:
+    return [UUID(transaction_id) for transaction_id in value.decode().split(',')]
+
+
+class RedisStreamTransactionAnalyzer:
+    # Публикует задания на категоризацию в Redis Stream через redis.asyncio, не блокируя loop API.
+    # Читает их консьюмер-группа из tasks.stream_worker; сообщение - пачка id до batch_size штук
+    def __init__(self, redis: Redis, cfg: AnalysisConfig, fit_delegate: TransactionAnalyzer):
+        self._redis = redis
+        self._cfg = cfg
+        self._fit_delegate = fit_delegate
+
+    async def analyze(self, transaction_id: UUID):
+        await self.analyze_many([transaction_id])
+
+    async def analyze_many(self, transaction_ids: list[UUID]):
+        if not transaction_ids:
+            return
+
+        # Все XADD выписки уходят одним pipeline - один round-trip до Redis
+        batch_size = self._cfg.batch_size
+        async with self._redis.pipeline(transaction=False) as pipe:
+            for i in range(0, len(transaction_ids), batch_size):
+                pipe.xadd(
+                    self._cfg.stream,
+                    {IDS_FIELD: encode_ids(transaction_ids[i:i + batch_size])},
+                    maxlen=self._cfg.stream_maxlen,
+                    approximate=True,
+                )
+            messages = await pipe.execute()
+        TOTAL_MESSAGES_PRODUCED.inc(len(messages))
+
+    async def fit_model(self, countdown: float = 0):
+        # Обучение редкое и отложенное (countdown), его по-прежнему планирует celery
+        await self._fit_delegate.fit_model(countdown)
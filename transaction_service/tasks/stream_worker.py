@@ -0,0 +1,117 @@
+import asyncio
+import logging
+import os
+import signal
+import socket
+import time
+
+from dishka import AsyncContainer, make_async_container
+from redis.asyncio import Redis
+from redis.exceptions import ResponseError
+
+from transaction_service.config import AnalysisConfig
+from transaction_service.tasks.ai_tasks import DatabaseProvider, analyze_transactions, cfg
+from transaction_service.tasks.stream_analyzer import IDS_FIELD, decode_ids
+
+logger = logging.getLogger(__name__)
+
+
+class StreamConsumer:
+    # Консьюмер Redis Stream с заданиями от RedisStreamTransactionAnalyzer.
+    # Сообщение подтверждается (XACK) после обработки, в том числе неудачной: analyze_transactions
+    # уже пометил строки failed, как и celery-задача. Сообщения упавшего консьюмера остаются
+    # неподтверждёнными, и через claim_idle_ms их забирает себе живой консьюмер (XAUTOCLAIM).
+    # Одновременно обрабатывается до concurrency сообщений: новые читаются, как только
+    # освобождается место, и медленное сообщение не задерживает остальные
+    def __init__(self, redis: Redis, container: AsyncContainer, cfg: AnalysisConfig, name: str):
+        self._redis = redis
+        self._container = container
+        self._cfg = cfg
+        self._name = name
+        self._claimed_at = 0.0
+
+    async def run(self, stop: asyncio.Event) -> None:
+        await self._ensure_group()
+        in_flight: set[asyncio.Task] = set()
+        try:
+            while not stop.is_set():
+                free = self._cfg.concurrency - len(in_flight)
+                if free <= 0:
+                    done, in_flight = await asyncio.wait(in_flight, return_when=asyncio.FIRST_COMPLETED)
+                else:
+                    count = min(free, self._cfg.read_count)
+                    for message_id, fields in await self._claim_stale(count) or await self._read(count):
+                        in_flight.add(asyncio.create_task(self._handle(message_id, fields)))
+                    # Завершившиеся за время чтения задачи освобождают места
+                    done = {task for task in in_flight if task.done()}
+                    in_flight -= done
+                # Ошибки анализа _handle гасит сам, до сюда доходят только ошибки Redis при XACK
+                for task in done:
+                    task.result()
+        finally:
+            # При остановке доделываем и подтверждаем уже взятые сообщения
+            await asyncio.gather(*in_flight, return_exceptions=True)
+
+    async def _ensure_group(self) -> None:
+        try:
+            await self._redis.xgroup_create(
+                self._cfg.stream, self._cfg.consumer_group, id='0', mkstream=True,
+            )
+        except ResponseError as e:
+            if 'BUSYGROUP' not in str(e):
+                raise
+
+    async def _read(self, count: int) -> list:
+        response = await self._redis.xreadgroup(
+            self._cfg.consumer_group,
+            self._name,
+            {self._cfg.stream: '>'},
+            count=count,
+            block=self._cfg.block_ms,
+        )
+        return response[0][1] if response else []
+
+    async def _claim_stale(self, count: int) -> list:
+        if time.monotonic() - self._claimed_at < self._cfg.claim_idle_ms / 1000:
+            return []
+        self._claimed_at = time.monotonic()
+        _, messages, *_ = await self._redis.xautoclaim(
+            self._cfg.stream,
+            self._cfg.consumer_group,
+            self._name,
+            min_idle_time=self._cfg.claim_idle_ms,
+            count=count,
+        )
+        return messages
+
+    async def _handle(self, message_id: bytes, fields: dict) -> None:
+        try:
+            # У забранного XAUTOCLAIM сообщения, которое успели обрезать по MAXLEN, полей нет
+            if fields:
+                await analyze_transactions(self._container, decode_ids(fields[IDS_FIELD]))
+        except Exception:
+            logger.exception('Failed to analyze transactions from message %s', message_id)
+        await self._redis.xack(self._cfg.stream, self._cfg.consumer_group, message_id)
+
+
+async def main() -> None:
+    redis = Redis.from_url(cfg.redis.uri)
+    container = make_async_container(DatabaseProvider())
+    name = f'{socket.gethostname()}-{os.getpid()}'
+    consumer = StreamConsumer(redis, container, cfg.analysis, name=name)
+
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop.set)
+
+    try:
+        await consumer.run(stop)
+    finally:
+        await container.close()
+        await redis.aclose()
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(main())
@@ -1,60 +1,175 @@
-import hashlib
-import json
-from functools import wraps
-from typing import Any
+import asyncio
+import logging
+import time
+from collections.abc import Awaitable, Callable, Sequence
+from typing import Optional
+from uuid import UUID
 
-from pydantic import BaseModel
+from cachetools import LRUCache
+from pydantic import TypeAdapter
 from redis.asyncio import Redis
 
+from transaction_service.schemas.transaction import TransactionResponse
 
-def cache(ttl: int = 60):
-    def decorator(func):
-        @wraps(func)
-        async def wrapper(*args, **kwargs):
-            redis_client: Redis = kwargs.get("redis_client")
-            args_str = json.dumps(args, default=str)
-
-            # Создаём уникальный ключ кэша на основе имени функции и аргументов
-            kwargs_for_key = kwargs.copy()
-            kwargs_for_key.pop("redis_client")
-            kwargs_for_key.pop("service")
-            kwargs_str = json.dumps(kwargs_for_key, default=str)
-            cache_key = hashlib.md5(f"{func.__name__}:{args_str}:{kwargs_str}".encode()).hexdigest()
-
-            # Проверяем наличие в кэше
-            cached_result = await redis_client.get(cache_key)
-            print('Cached key: ', cache_key, '; value:', cached_result)
-            if cached_result:
-                print('Got cached result')
-                return _load_json_value(cached_result)
-
-            # Выполняем функцию и кэшируем результат
-            result = await func(*args, **kwargs)
-            await redis_client.setex(cache_key, ttl, _build_json_value(result))
-            return result
-        return wrapper
-    return decorator
-
-
-def _build_json_value(value) -> str:
-    if isinstance(value, list):
-        result: list[str] = []
-        for item in value:
-            item: BaseModel
-            result.append(item.model_dump_json())
-        return json.dumps(result, default=str)
-
-    return json.dumps(value.model_dump_json(), default=str)
-
-
-def _load_json_value(value) -> Any:
-    obj = json.loads(value)
-    if isinstance(obj, list):
-        result = []
-        for item in obj:
-            print(item)
-            result.append(json.loads(item))
-        return result
-
-    result = json.loads(obj)
-    return result
+logger = logging.getLogger(__name__)
+
+INVALIDATION_CHANNEL = 'cache:transactions:invalidate'
+LOCK_POLL_INTERVAL = 0.02
+
+# Записать значение, только если поколение ключа не изменилось с начала загрузки:
+# KEYS = [ключ, ключ поколения], ARGV = [поколение до загрузки, значение, ttl]
+SET_IF_GENERATION_SCRIPT = """
+local generation = redis.call('GET', KEYS[2]) or ''
+if generation ~= ARGV[1] then
+    return 0
+end
+redis.call('SET', KEYS[1], ARGV[2], 'EX', ARGV[3])
+return 1
+"""
+
+_response_adapter = TypeAdapter(TransactionResponse)
+
+
+def _key(transaction_id: UUID | str) -> str:
+    return f'cache:transaction:{transaction_id}'
+
+
+def _generation_key(key: str) -> str:
+    return f'{key}:generation'
+
+
+class RedisTransactionCache:
+    # Read-through кэш ответа GET /transactions/{id}: L1 LRU процесса перед Redis.
+    # Значение - JSON-байты TransactionResponse: сериализуются один раз при заполнении
+    # и отдаются клиенту как есть, без повторной валидации и дампа.
+    #
+    # invalidate() удаляет ключи из Redis, увеличивает их поколение и публикует id
+    # в INVALIDATION_CHANNEL - процессы API чистят по нему свой L1 (start() запускает подписку).
+    # Pub/sub доходит с задержкой, поэтому загрузка из базы запоминает поколение в Redis до
+    # чтения строки и кладёт значение только при неизменном поколении: инвалидация из другого
+    # процесса, прошедшая во время загрузки, не даёт записать устаревший ответ.
+    #
+    # Промах грузит строку один раз: внутри процесса конкурентные запросы ждут одну загрузку,
+    # между процессами её грузит владелец короткого Redis-лока, остальные ждут значение в Redis
+    def __init__(self, redis: Redis, ttl: int, l1_size: int, lock_timeout: float):
+        self._redis = redis
+        self._ttl = ttl
+        self._lock_timeout = lock_timeout
+        self._l1: LRUCache = LRUCache(maxsize=l1_size)
+        self._inflight: dict[str, asyncio.Future] = {}
+        self._epoch = 0
+        self._listener: Optional[asyncio.Task] = None
+        self._set_if_generation = redis.register_script(SET_IF_GENERATION_SCRIPT)
+
+    def start(self) -> None:
+        self._listener = asyncio.create_task(self._listen())
+
+    async def close(self) -> None:
+        if self._listener is not None:
+            self._listener.cancel()
+            await asyncio.gather(self._listener, return_exceptions=True)
+
+    async def get_or_load(
+            self,
+            transaction_id: UUID,
+            loader: Callable[[], Awaitable[Optional[TransactionResponse]]],
+    ) -> Optional[bytes]:
+        key = _key(transaction_id)
+        value = self._l1.get(key)
+        if value is not None:
+            return value
+
+        inflight = self._inflight.get(key)
+        if inflight is not None:
+            return await asyncio.shield(inflight)
+
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            value = await self._load(key, loader)
+        except BaseException as e:
+            future.set_exception(e)
+            # Ожидающих может не быть - помечаем исключение полученным, чтобы asyncio не ругался
+            future.exception()
+            raise
+        else:
+            future.set_result(value)
+            return value
+        finally:
+            del self._inflight[key]
+
+    async def invalidate(self, transaction_ids: Sequence[UUID]) -> None:
+        if not transaction_ids:
+            return
+        keys = [_key(transaction_id) for transaction_id in transaction_ids]
+        self._evict(keys)
+        async with self._redis.pipeline(transaction=True) as pipe:
+            pipe.delete(*keys)
+            for key in keys:
+                # Поколение живёт не меньше, чем может идти загрузка, и не копится вечно
+                pipe.incr(_generation_key(key))
+                pipe.expire(_generation_key(key), self._ttl)
+            pipe.publish(INVALIDATION_CHANNEL, ','.join(map(str, transaction_ids)))
+            await pipe.execute()
+
+    async def _load(self, key: str, loader) -> Optional[bytes]:
+        epoch = self._epoch
+        value = await self._redis.get(key)
+        fresh = True
+        if value is None:
+            value, fresh = await self._load_locked(key, loader)
+        if value is not None and fresh and epoch == self._epoch:
+            self._l1[key] = value
+        return value
+
+    async def _load_locked(self, key: str, loader) -> tuple[Optional[bytes], bool]:
+        # Возвращает значение и признак, что оно не устарело за время загрузки
+        lock_key = f'{key}:lock'
+        locked = await self._redis.set(lock_key, 1, nx=True, px=int(self._lock_timeout * 1000))
+        if not locked:
+            # Строку уже грузит другой процесс - ждём его значение, но не дольше lock_timeout
+            deadline = time.monotonic() + self._lock_timeout
+            while time.monotonic() < deadline:
+                await asyncio.sleep(LOCK_POLL_INTERVAL)
+                value = await self._redis.get(key)
+                if value is not None:
+                    return value, True
+
+        generation_key = _generation_key(key)
+        generation = await self._redis.get(generation_key) or b''
+        try:
+            response = await loader()
+            if response is None:
+                return None, True
+            value = _response_adapter.dump_json(response)
+            stored = await self._set_if_generation(
+                keys=[key, generation_key],
+                args=[generation, value, self._ttl],
+            )
+            return value, bool(stored)
+        finally:
+            if locked:
+                await self._redis.delete(lock_key)
+
+    def _evict(self, keys: Sequence[str]) -> None:
+        self._epoch += 1
+        for key in keys:
+            self._l1.pop(key, None)
+
+    async def _listen(self) -> None:
+        while True:
+            pubsub = self._redis.pubsub()
+            try:
+                await pubsub.subscribe(INVALIDATION_CHANNEL)
+                async for message in pubsub.listen():
+                    if message['type'] == 'message':
+                        self._evict([_key(id_) for id_ in message['data'].decode().split(',')])
+            except Exception:
+                # Любая ошибка обрывает подписку, а пока её нет, инвалидации теряются -
+                # L1 больше не верим и переподписываемся
+                logger.exception('Cache invalidation subscription lost')
+                self._epoch += 1
+                self._l1.clear()
+                await asyncio.sleep(1)
+            finally:
+                await pubsub.aclose()
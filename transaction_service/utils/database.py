@@ -0,0 +1,85 @@
+import logging
+import time
+
+from sqlalchemy import event, exc
+from sqlalchemy.ext.asyncio import AsyncEngine, create_async_engine
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+
+from transaction_service.config import DatabaseConfig
+from transaction_service.utils.metrics import (
+    DB_POOL_CHECKED_OUT,
+    DB_POOL_TIMEOUTS,
+    DB_POOL_WAIT_DURATION,
+    DB_QUERY_DURATION,
+)
+
+logger = logging.getLogger(__name__)
+
+# Сколько символов запроса писать в лог медленных запросов
+SLOW_QUERY_LOG_LIMIT = 1000
+
+
+class InstrumentedQueuePool(AsyncAdaptedQueuePool):
+    # Время получения соединения из пула: ожидание свободного, открытие нового и pre-ping
+    def connect(self):
+        start_time = time.perf_counter()
+        try:
+            return super().connect()
+        except exc.TimeoutError:
+            DB_POOL_TIMEOUTS.inc()
+            raise
+        finally:
+            DB_POOL_WAIT_DURATION.observe(time.perf_counter() - start_time)
+
+
+def create_engine(cfg: DatabaseConfig, application_name: str) -> AsyncEngine:
+    # Один engine на процесс (API, celery-воркер, stream_worker, outbox_relay) с настройками [db.pool]
+    engine = create_async_engine(
+        cfg.uri,
+        poolclass=InstrumentedQueuePool,
+        pool_size=cfg.pool.size,
+        max_overflow=cfg.pool.max_overflow,
+        pool_timeout=cfg.pool.timeout,
+        pool_recycle=cfg.pool.recycle,
+        pool_pre_ping=cfg.pool.pre_ping,
+        echo=cfg.pool.echo,
+        connect_args={
+            # Кэш подготовленных запросов SQLAlchemy-адаптера и самого asyncpg
+            'prepared_statement_cache_size': cfg.pool.statement_cache_size,
+            'statement_cache_size': cfg.pool.statement_cache_size,
+            'server_settings': {'application_name': application_name},
+        },
+    )
+    instrument_engine(engine, slow_query_threshold=cfg.slow_query_threshold)
+    return engine
+
+
+def instrument_engine(engine: AsyncEngine, slow_query_threshold: float) -> None:
+    sync_engine = engine.sync_engine
+
+    @event.listens_for(sync_engine, 'checkout')
+    def on_checkout(*_):
+        DB_POOL_CHECKED_OUT.set(sync_engine.pool.checkedout())
+
+    @event.listens_for(sync_engine, 'checkin')
+    def on_checkin(*_):
+        DB_POOL_CHECKED_OUT.set(sync_engine.pool.checkedout())
+
+    @event.listens_for(sync_engine, 'before_cursor_execute')
+    def on_before_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault('query_start_time', []).append(time.perf_counter())
+
+    @event.listens_for(sync_engine, 'after_cursor_execute')
+    def on_after_execute(conn, cursor, statement, parameters, context, executemany):
+        duration = time.perf_counter() - conn.info['query_start_time'].pop()
+        operation = (statement.split(None, 1) or ['UNKNOWN'])[0].upper()
+        DB_QUERY_DURATION.labels(operation).observe(duration)
+        if duration >= slow_query_threshold:
+            logger.warning('Slow query (%.3f s): %s', duration, statement[:SLOW_QUERY_LOG_LIMIT])
+
+    @event.listens_for(sync_engine, 'handle_error')
+    def on_error(context):
+        # Упавший запрос не доходит до after_cursor_execute - снимаем его отметку времени
+        starts = context.connection.info.get('query_start_time') if context.connection else None
+        if starts:
+            starts.pop()
@@ -2,9 +2,20 @@ import time
 from functools import wraps
 from typing import Any, Callable
 
-from prometheus_client import Counter, Histogram
+from prometheus_client import Counter, Gauge, Histogram, Info
 
 REQUESTS_TOTAL = Counter('http_requests_total', 'Total HTTP Requests')
+HTTP_REQUESTS_BY_ROUTE = Counter(
+    'http_requests_by_route_total',
+    'HTTP requests by method, route path template and response status',
+    ['method', 'path', 'status']
+)
+HTTP_REQUEST_DURATION = Histogram(
+    'http_request_duration_seconds',
+    'Time spent on handling HTTP request by method and route path template',
+    ['method', 'path'],
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, float('inf'))
+)
 TOTAL_MESSAGES_PRODUCED = Counter(
     'messages_produced_to_ai_service_total',
     'Total messages produced to AI service'
@@ -15,11 +26,80 @@ CREATE_TRANSACTION_METHOD_DURATION = Histogram(
     'Time spent in creating transaction',
     buckets=(0.01, 0.05, 0.1, 0.5, 1.0, 2.0, 5.0, 10.0, float('inf'))
 )
+CREATE_TRANSACTIONS_BATCH_METHOD_DURATION = Histogram(
+    'create_transactions_batch_duration_seconds',
+    'Time spent in creating a batch of transactions',
+    buckets=(0.01, 0.05, 0.1, 0.5, 1.0, 2.0, 5.0, 10.0, float('inf'))
+)
 GET_ALL_TRANSACTIONS_METHOD_DURATION = Histogram(
     'get_all_transactions_duration_seconds',
     'Measure time of getting all transactions from database',
     buckets=(0.01, 0.05, 0.1, 0.5, 1.0, 2.0, 5.0, 10.0, float('inf'))
 )
+ANALYSIS_BATCH_SIZE = Histogram(
+    'analysis_batch_size',
+    'Number of transactions categorized in one model call',
+    buckets=(1, 5, 10, 25, 50, 100, 250, 500, 1000, float('inf'))
+)
+ANALYSIS_BATCH_DURATION = Histogram(
+    'analysis_batch_duration_seconds',
+    'Time spent on loading, categorizing and saving one batch of transactions',
+    buckets=(0.01, 0.05, 0.1, 0.5, 1.0, 2.0, 5.0, 10.0, float('inf'))
+)
+
+MODEL_ACTIVE_VERSION = Info(
+    'model_active_version',
+    'Version of the categorization model published in the registry'
+)
+
+RETRAIN_QUEUE_DEPTH = Gauge(
+    'retrain_queue_depth',
+    'Category edits waiting for the next model fit'
+)
+MODEL_FIT_DURATION = Histogram(
+    'model_fit_duration_seconds',
+    'Time spent on fitting the categorization model',
+    buckets=(1.0, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0, 600.0, float('inf'))
+)
+
+PUBLISHER_BUFFER_DEPTH = Gauge(
+    'analysis_publisher_buffer_depth',
+    'Analyze requests buffered in the API process and not yet published to the broker'
+)
+PUBLISHER_FLUSH_DURATION = Histogram(
+    'analysis_publisher_flush_duration_seconds',
+    'Time spent on publishing one buffered group of analyze requests to the broker',
+    buckets=(0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, float('inf'))
+)
+
+OUTBOX_RELAYED = Counter(
+    'analysis_outbox_relayed_total',
+    'Analysis jobs republished from the outbox by the relay'
+)
+OUTBOX_STUCK_REQUEUED = Counter(
+    'analysis_outbox_stuck_requeued_total',
+    'In-progress transactions without an outbox job that were put back into the outbox'
+)
+
+DB_POOL_CHECKED_OUT = Gauge(
+    'db_pool_checked_out_connections',
+    'Database connections currently checked out of the pool'
+)
+DB_POOL_WAIT_DURATION = Histogram(
+    'db_pool_wait_duration_seconds',
+    'Time spent on getting a connection from the pool, including waiting for a free one',
+    buckets=(0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 30.0, float('inf'))
+)
+DB_POOL_TIMEOUTS = Counter(
+    'db_pool_timeouts_total',
+    'Connection requests that gave up after pool timeout'
+)
+DB_QUERY_DURATION = Histogram(
+    'db_query_duration_seconds',
+    'Time spent on executing one database statement by SQL operation',
+    ['operation'],
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 5.0, float('inf'))
+)
 
 
 def measure_latency(histogram: Histogram) -> Callable[[Any], Any]:
@@ -0,0 +1,22 @@
+import base64
+from datetime import datetime
+from uuid import UUID
+
+
+class InvalidCursorError(ValueError):
+    pass
+
+
+# Курсор - последняя отданная пара (receipt_date, id); для клиента это непрозрачная строка
+def encode_cursor(receipt_date: datetime, transaction_id: UUID) -> str:
+    raw = f'{receipt_date.isoformat()}|{transaction_id}'
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor: str) -> tuple[datetime, UUID]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode()
+        receipt_date, transaction_id = raw.split('|')
+        return datetime.fromisoformat(receipt_date), UUID(transaction_id)
+    except ValueError as e:
+        raise InvalidCursorError('Invalid pagination cursor') from e
@@ -0,0 +1,26 @@
+import resource
+
+
+def memory_usage() -> dict[str, int]:
+    # Память процесса в КБ: rss - резидентная, pss - с долей разделяемых страниц,
+    # private - только страницы процесса. smaps_rollup есть только в Linux,
+    # в остальных ОС отдаём пиковый RSS
+    try:
+        with open('/proc/self/smaps_rollup') as f:
+            values = {}
+            for line in f:
+                name, *rest = line.split()
+                if name.endswith(':') and rest and rest[0].isdigit():
+                    values[name[:-1]] = int(rest[0])
+    except FileNotFoundError:
+        return {'rss': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss}
+
+    return {
+        'rss': values['Rss'],
+        'pss': values['Pss'],
+        'private': values['Private_Clean'] + values['Private_Dirty'],
+    }
+
+
+def format_memory_usage() -> str:
+    return ' '.join(f'{name}={value / 1024:.1f}MB' for name, value in memory_usage().items())
@@ -0,0 +1,78 @@
+import time
+from typing import Optional
+
+from cachetools import TTLCache
+from redis.asyncio import Redis
+
+from transaction_service.config import RateLimitConfig
+
+# Скользящее окно из двух фиксированных: счётчик прошлого окна берётся с весом оставшейся
+# доли текущего. Проверка и инкремент - один EVALSHA, время берётся у Redis, поэтому
+# окна совпадают у всех инстансов API. Ответ: {1, 0} - пропустить, {0, retry_after_ms} - 429.
+# Ключи окон строятся от KEYS[1], в нём hash tag - оба ключа попадают в один слот кластера
+SLIDING_WINDOW_SCRIPT = """
+local limit = tonumber(ARGV[1])
+local window = tonumber(ARGV[2])
+local time = redis.call('TIME')
+local now = tonumber(time[1]) + tonumber(time[2]) / 1000000
+local current = math.floor(now / window)
+local elapsed = now - current * window
+
+local current_key = KEYS[1] .. ':' .. current
+local previous_count = tonumber(redis.call('GET', KEYS[1] .. ':' .. (current - 1)) or '0')
+local current_count = tonumber(redis.call('GET', current_key) or '0')
+local estimated = previous_count * (window - elapsed) / window + current_count
+
+if estimated + 1 > limit then
+    -- Оценка падает со скоростью previous_count / window, пока не кончится текущее окно
+    local retry_after = window - elapsed
+    if previous_count > 0 and current_count < limit then
+        retry_after = math.min(retry_after, (estimated + 1 - limit) * window / previous_count)
+    end
+    return {0, math.ceil(retry_after * 1000)}
+end
+
+redis.call('INCR', current_key)
+redis.call('EXPIRE', current_key, window * 2)
+return {1, 0}
+"""
+
+
+class SlidingWindowRateLimiter:
+    # Лимит на клиента и правило: "МЕТОД /префикс" из конфига с самым длинным подходящим префиксом
+    # или лимит по умолчанию. Уже заблокированным клиентам отвечаем 429 из локального кэша,
+    # не обращаясь к Redis, пока не истечёт их retry_after
+    def __init__(self, redis: Redis, cfg: RateLimitConfig):
+        self._script = redis.register_script(SLIDING_WINDOW_SCRIPT)
+        self._window = cfg.window
+        self._default_limit = cfg.limit
+        self._rules = sorted(
+            (tuple(rule.split(' ', 1)) + (limit,) for rule, limit in cfg.routes.items()),
+            key=lambda rule: len(rule[1]),
+            reverse=True,
+        )
+        self._blocked: TTLCache = TTLCache(maxsize=cfg.local_cache_size, ttl=cfg.window)
+
+    def rule_for(self, method: str, path: str) -> tuple[str, int]:
+        for rule_method, prefix, limit in self._rules:
+            if method == rule_method and path.startswith(prefix):
+                return f'{rule_method}:{prefix}', limit
+        return 'default', self._default_limit
+
+    async def hit(self, client: str, method: str, path: str) -> Optional[float]:
+        # None - запрос можно пропустить, иначе через сколько секунд клиенту стоит повторить
+        rule, limit = self.rule_for(method, path)
+        key = f'ratelimit:{{{client}}}:{rule}'
+
+        now = time.monotonic()
+        blocked_until = self._blocked.get(key)
+        if blocked_until is not None and blocked_until > now:
+            return blocked_until - now
+
+        allowed, retry_after_ms = await self._script(keys=[key], args=[limit, self._window])
+        if allowed:
+            return None
+
+        retry_after = retry_after_ms / 1000
+        self._blocked[key] = now + retry_after
+        return retry_after
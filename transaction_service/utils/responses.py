@@ -0,0 +1,11 @@
+from typing import Any
+
+from starlette.responses import JSONResponse
+
+
+class JSONBytesResponse(JSONResponse):
+    # Ответ из уже закодированного JSON: тело отдаётся как есть, без повторной
+    # валидации по response_model и без json.dumps. Наследник JSONResponse - чтобы
+    # схема ответа в OpenAPI по-прежнему строилась из response_model. content - bytes
+    def render(self, content: Any) -> bytes:
+        return content